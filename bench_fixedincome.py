@@ -0,0 +1,248 @@
+"""
+Benchmark suite of the hot paths of fixedincome.
+
+	python bench_fixedincome.py [--scales 1,1000,100000,10000000] [--only ir,period]
+		[--output bench_results.json] [--baseline bench_baseline.json] [--threshold 0.25]
+
+Every case runs at each scale: 1 is the scalar path, timed per call over
+a loop (ir, period, InterestRate.compound/discount, CalendarRangePeriod.size),
+larger scales run the batch path once over that many items (RateBook of
+the rate specs, parse_periods, compound_many/discount_many,
+CalendarRangePeriodArray). Calendar loading (ANBIMA.cal as text, compiled
+and from the registry) runs at the scalar scale only.
+
+The dates are the pairs of the weekday fixtures (monday.csv ... sunday.csv)
+shifted by whole weeks, so batches keep their mix of weekdays, and business
+days are counted on ANBIMA.cal.
+
+Results, in seconds per item, are written as JSON to --output. With
+--baseline, they are compared to a former output and the cases slower by
+more than --threshold (a fraction) are reported as regressions, making the
+exit status 1.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import numpy as np
+from fixedincome import *
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = ['%s.csv' % day for day in ('monday', 'tuesday', 'wednesday',
+	'thursday', 'friday', 'saturday', 'sunday')]
+COMPOUNDINGS = ('simple', 'compounded', 'continuous')
+DAYCOUNTS = DayCount.names
+SCALES = (1, 1000, 100000, 10000000)
+
+def fixture_dates():
+	"""Return the (starts, ends) datetime64 arrays of the weekday fixtures."""
+	starts, ends = [], []
+	for fname in FIXTURES:
+		with open(os.path.join(HERE, fname)) as f:
+			for line in f:
+				fields = line.strip().split(',')
+				if len(fields) >= 2:
+					starts.append(fields[0])
+					ends.append(fields[1])
+	return (np.array(starts, dtype='datetime64[D]'),
+		np.array(ends, dtype='datetime64[D]'))
+
+def dates(n):
+	"""Return n (starts, ends) pairs: the fixtures shifted by whole weeks."""
+	starts, ends = fixture_dates()
+	i = np.arange(n)
+	weeks = ((i//len(starts)) % 1500 - 750)*7
+	return starts[i % len(starts)] + weeks, ends[i % len(starts)] + weeks + 7*(i % 520)
+
+def range_specs(n):
+	"""Return n 'YYYY-MM-DD:YYYY-MM-DD' specifications as a bytes array."""
+	starts, ends = dates(n)
+	specs = np.empty(n, dtype='S21')
+	chars = specs.view('S1').reshape(n, 21)
+	chars[:, :10] = starts.astype('S10').view('S1').reshape(n, 10)
+	chars[:, 10] = b':'
+	chars[:, 11:] = ends.astype('S10').view('S1').reshape(n, 10)
+	return specs
+
+def rate_specs(n, distinct=1000):
+	"""Return n rate specifications, of distinct different rates."""
+	values = np.array([('%.4f annual compounded business/252 calANBIMA' %
+		(0.05 + 0.1*i/distinct)).encode() for i in range(distinct)])
+	return values[np.arange(n) % distinct]
+
+def rate(compounding, daycount):
+	cal = ' calANBIMA' if daycount.startswith('business') else ''
+	return ir('0.1 annual %s %s%s' % (compounding, daycount, cal))
+
+def scalar_loop(func, args, min_time=0.2):
+	"""Return the best time per call of func over args, looping min_time."""
+	best = float('inf')
+	deadline = time.time() + min_time
+	while True:
+		start = time.time()
+		for a in args:
+			func(a)
+		best = min(best, (time.time() - start)/len(args))
+		if time.time() > deadline:
+			return best
+
+def batch(func, n):
+	"""Return the best time per item of func() over n items."""
+	repeat = 1 if n >= 1000000 else 3
+	best = float('inf')
+	for i in range(repeat):
+		start = time.time()
+		func()
+		best = min(best, (time.time() - start)/n)
+	return best
+
+# the cases: name -> function(scale) returning the seconds per item, or None
+# when the scale does not apply
+
+def bench_ir(n):
+	if n == 1:
+		specs = [s.decode() for s in rate_specs(1000)]
+		return scalar_loop(ir, specs)
+	specs = rate_specs(n)
+	def parse():
+		values, inverse = np.unique(specs, return_inverse=True)
+		return RateBook.from_specs([str(v.decode()) for v in values]).take(inverse)
+	return batch(parse, n)
+
+def bench_ir_uncached(n):
+	if n != 1:
+		return None
+	specs = [s.decode() for s in rate_specs(1000)]
+	sizes = ir_cache.maxsize, ir_templates.maxsize
+	ir_cache.resize(0)
+	ir_templates.resize(0)
+	try:
+		return scalar_loop(ir, specs)
+	finally:
+		ir_cache.resize(sizes[0])
+		ir_templates.resize(sizes[1])
+
+def bench_period(n):
+	specs = range_specs(n)
+	if n == 1:
+		specs = [s.decode() for s in range_specs(1000)]
+		return scalar_loop(period, specs)
+	return batch(lambda: parse_periods(specs), n)
+
+def bench_factor(method, compounding, daycount):
+	r = rate(compounding, daycount)
+	def bench(n):
+		if n == 1:
+			starts, ends = dates(1000)
+			periods = [DateRangePeriod((s, e)) for s, e in zip(starts.astype(object),
+				ends.astype(object))]
+			return scalar_loop(getattr(r, method), periods)
+		periods = DateRangePeriodArray(dates(n))
+		return batch(lambda: getattr(r, method + '_many')(periods), n)
+	return bench
+
+def bench_bizdays(n):
+	cal = calendars.get('ANBIMA')
+	if n == 1:
+		starts, ends = dates(1000)
+		periods = [CalendarRangePeriod(DateRangePeriod((s, e)), cal)
+			for s, e in zip(starts.astype(object), ends.astype(object))]
+		return scalar_loop(lambda p: p.size(), periods)
+	periods = CalendarRangePeriodArray(DateRangePeriodArray(dates(n)), cal)
+	return batch(periods.size, n)
+
+def bench_calendar_file(n):
+	if n != 1:
+		return None
+	fname = os.path.join(HERE, 'ANBIMA.cal')
+	return scalar_loop(CalendarIndex.from_file, [fname]*5)
+
+def bench_calendar_compiled(n):
+	if n != 1:
+		return None
+	tmpdir = tempfile.mkdtemp()
+	try:
+		fname = compile_calendar(os.path.join(HERE, 'ANBIMA.cal'),
+			os.path.join(tmpdir, 'ANBIMA.calc'))
+		return scalar_loop(CalendarIndex.from_compiled, [fname]*100)
+	finally:
+		shutil.rmtree(tmpdir)
+
+def bench_calendar_registry(n):
+	if n != 1:
+		return None
+	calendars.get('ANBIMA')
+	return scalar_loop(calendars.get, ['ANBIMA']*100)
+
+def cases():
+	result = [('ir', bench_ir), ('ir/uncached', bench_ir_uncached),
+		('period', bench_period)]
+	for method in ('compound', 'discount'):
+		for compounding in COMPOUNDINGS:
+			for daycount in DAYCOUNTS:
+				result.append(('%s/%s/%s' % (method, compounding, daycount),
+					bench_factor(method, compounding, daycount)))
+	result += [('bizdays', bench_bizdays), ('calendar/file', bench_calendar_file),
+		('calendar/compiled', bench_calendar_compiled),
+		('calendar/registry', bench_calendar_registry)]
+	return result
+
+def run(scales=SCALES, only=None, out=sys.stdout):
+	results = {}
+	for name, bench in cases():
+		if only and not any(name == o or name.startswith(o + '/') for o in only):
+			continue
+		for n in scales:
+			seconds = bench(n)
+			if seconds is None:
+				continue
+			key = '%s@%d' % (name, n)
+			results[key] = seconds
+			out.write('%-45s %14.1f ns/item\n' % (key, seconds*1e9))
+			out.flush()
+	return results
+
+def compare(results, baseline, threshold):
+	"""Return the (key, baseline, current) of the regressions."""
+	regressions = []
+	for key, seconds in sorted(results.items()):
+		base = baseline.get(key)
+		if base is not None and seconds > base*(1 + threshold):
+			regressions.append((key, base, seconds))
+	return regressions
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark suite of fixedincome.')
+	parser.add_argument('--scales', default=','.join(str(s) for s in SCALES),
+		help='comma separated scales, 1 being the scalar path')
+	parser.add_argument('--only', help='comma separated case names (or prefixes)')
+	parser.add_argument('--output', default='bench_results.json')
+	parser.add_argument('--baseline', help='former output to compare with')
+	parser.add_argument('--threshold', type=float, default=0.25,
+		help='slowdown reported as a regression (default 0.25, 25%%)')
+	args = parser.parse_args(argv)
+	scales = [int(s) for s in args.scales.split(',')]
+	only = args.only.split(',') if args.only else None
+	results = run(scales, only)
+	with open(args.output, 'w') as f:
+		json.dump({'python': platform.python_version(), 'numpy': np.__version__,
+			'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+			'unit': 'seconds per item', 'results': results}, f, indent=1, sort_keys=True)
+	if args.baseline:
+		with open(args.baseline) as f:
+			baseline = json.load(f)['results']
+		regressions = compare(results, baseline, args.threshold)
+		for key, base, seconds in regressions:
+			print('REGRESSION %-45s %10.1f -> %10.1f ns/item (%+.0f%%)' % (key,
+				base*1e9, seconds*1e9, (seconds/base - 1)*100))
+		print('%d regressions over %d cases compared with %s' % (len(regressions),
+			len(set(results) & set(baseline)), args.baseline))
+		return 1 if regressions else 0
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
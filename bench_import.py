@@ -0,0 +1,68 @@
+"""
+Import time of fixedincome, measured with python -X importtime.
+
+	python bench_import.py [--runs 10] [--budget 10]
+
+Imports fixedincome in fresh interpreters (after a first one, writing the
+byte code) and reports the median import time, split between numpy and the
+rest: fixedincome itself and the other modules it imports. The exit status
+is 1 when the rest exceeds the budget, in milliseconds, so that startup
+does not regress. Calendars and tables are loaded lazily, so they must not
+count (see prewarm).
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def importtime(module='fixedincome'):
+	"""
+	Return the cumulative import times, in microseconds, of module and of
+	the modules it imports first, by name, in a fresh interpreter.
+	"""
+	env = dict(os.environ)
+	env.pop('PYTHONDONTWRITEBYTECODE', None)
+	proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+		'import %s' % module], cwd=HERE, env=env, stdout=subprocess.PIPE,
+		stderr=subprocess.PIPE, universal_newlines=True)
+	out, err = proc.communicate()
+	if proc.returncode != 0:
+		raise Exception('import %s failed:\n%s' % (module, err))
+	times = {}
+	for line in err.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		self_us, cumulative, name = line[len('import time:'):].split('|')
+		name = name.strip()
+		# the first import is the one that counts, nested ones are cached
+		times.setdefault(name, int(cumulative))
+	return times
+
+def median(values):
+	values = sorted(values)
+	return values[len(values)//2]
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Import time of fixedincome.')
+	parser.add_argument('--runs', type=int, default=10)
+	parser.add_argument('--budget', type=float, default=10.0,
+		help='milliseconds allowed besides numpy (default 10)')
+	args = parser.parse_args(argv)
+	if sys.version_info < (3, 7):
+		parser.error('python -X importtime requires Python 3.7+')
+	importtime()
+	runs = [importtime() for i in range(args.runs)]
+	total = median([r['fixedincome'] for r in runs])/1000.0
+	numpy = median([r.get('numpy', 0) for r in runs])/1000.0
+	rest = total - numpy
+	print('import fixedincome: %.1f ms (numpy %.1f ms, rest %.1f ms, budget %.1f ms)' %
+		(total, numpy, rest, args.budget))
+	if rest > args.budget:
+		print('OVER BUDGET by %.1f ms' % (rest - args.budget))
+		return 1
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Memory footprint of a portfolio of InterestRate objects, before and after
+the conventions became flyweights.
+
+	python bench_memory.py [n]
+
+Builds n rates (100000 by default) the way a portfolio loader does, calling
+the DayCount, Frequency and Compounding constructors for every row, and
+reports the memory retained per rate, broken down by type. Objects shared by
+many rates (interned conventions, calendars) are counted once.
+
+The portfolio is built twice: with the legacy classes below, a replica of
+the former ones (a DayCount holding its own conversion tables, conventions
+and rates keeping their attributes in a __dict__), and with the current
+classes.
+"""
+import gc
+import sys
+import types
+from fixedincome import InterestRate, DayCount, Frequency, Compounding
+
+CONVENTIONS = [
+	('annual', 'compounded', 'business/252'),
+	('annual', 'simple', 'actual/360'),
+	('semi-annual', 'compounded', 'actual/365'),
+	('monthly', 'simple', 'actual/360'),
+	('annual', 'continuous', 'actual/365'),
+]
+
+# objects reached from the portfolio that do not belong to it
+_SKIP = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+# the former classes, their state only
+
+class LegacyDayCount(object):
+	def __init__(self, dc):
+		self._name = dc
+		self._daycount = dc
+		self._daysinbase = DayCount(dc).daysinbase
+		base = self._daysinbase
+		self._unitsize = {'year': 1, 'half-year': 2, 'quarter': 4, 'month': 12,
+			'day': base}
+		self._unit_convert = {
+			'year': {'day': base, 'month': 12, 'quarter': 4, 'half-year': 2,
+				'year': 1},
+			'half-year': {'day': base/2.0, 'month': 6, 'quarter': 2,
+				'half-year': 1, 'year': 0.5},
+			'quarter': {'day': base/4.0, 'month': 3, 'quarter': 1,
+				'half-year': 0.5, 'year': 1/4.0},
+			'month': {'day': base/12.0, 'month': 1, 'quarter': 3, 'half-year': 6,
+				'year': 12},
+			'day': {'day': 1, 'month': 12.0/base, 'quarter': 4.0/base,
+				'half-year': 2.0/base, 'year': 1.0/base}
+		}
+
+class LegacyFrequency(object):
+	def __init__(self, name):
+		self._name = name
+
+class LegacyCompounding(object):
+	def __init__(self, name):
+		self._name = name
+
+class LegacyInterestRate(object):
+	def __init__(self, rate, frequency, compounding, daycount, calendar=None):
+		self._rate = rate
+		self._frequency = frequency
+		self._compounding = compounding
+		self._daycount = daycount
+		self._calendar = calendar
+
+LEGACY = (LegacyInterestRate, LegacyFrequency, LegacyCompounding, LegacyDayCount)
+CURRENT = (InterestRate, Frequency, Compounding, DayCount)
+
+def portfolio(n, classes=CURRENT):
+	rate, frequency, compounding, daycount = classes
+	rates = []
+	for i in range(n):
+		freq, comp, dc = CONVENTIONS[i % len(CONVENTIONS)]
+		rates.append(rate(0.05 + i*1e-9, frequency(freq), compounding(comp),
+			daycount(dc)))
+	return rates
+
+def footprint(root):
+	"""Return the total size and the size by type of the objects under root."""
+	seen = set([id(root)])
+	sizes = {}
+	stack = list(gc.get_referents(root))
+	while stack:
+		obj = stack.pop()
+		if id(obj) in seen or isinstance(obj, _SKIP):
+			continue
+		seen.add(id(obj))
+		name = type(obj).__name__
+		sizes[name] = sizes.get(name, 0) + sys.getsizeof(obj)
+		stack.extend(gc.get_referents(obj))
+	return sum(sizes.values()), sizes
+
+def report(label, n, classes):
+	"""Print the footprint of a portfolio of n rates, return the total."""
+	rates = portfolio(n, classes)
+	total, sizes = footprint(rates)
+	print('%s: %d rates, %.1f MB retained, %.1f bytes per rate' % (label, n,
+		total/2.0**20, total/float(n)))
+	for name, size in sorted(sizes.items(), key=lambda x: -x[1]):
+		print('  %-20s %12d bytes %10.1f per rate' % (name, size, size/float(n)))
+	return total
+
+def main(n):
+	before = report('before', n, LEGACY)
+	after = report('after', n, CURRENT)
+	print('%.1f -> %.1f bytes per rate (%.1fx less)' % (before/float(n),
+		after/float(n), before/float(after)))
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
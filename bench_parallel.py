@@ -0,0 +1,55 @@
+"""
+Scaling of the parallel portfolio valuation (see present_value).
+
+	python bench_parallel.py [rows] [max workers]
+
+Values rows cashflows (2M by default) discounted by a RateBook mixing
+business/252, actual/360 and 30/360 rates, then by a YieldCurve, with 1 up
+to max workers processes (the number of CPUs by default), and reports the
+throughput, the speedup over the serial path and whether the results are
+identical to it.
+"""
+import sys
+import time
+import multiprocessing
+import numpy as np
+from fixedincome import RateBook, YieldCurve, present_value
+
+SPECS = [
+	'0.1 annual compounded business/252 calANBIMA',
+	'0.05 annual simple actual/360',
+	'0.07 semi-annual compounded 30/360',
+]
+
+def portfolio(n, seed=0):
+	rng = np.random.RandomState(seed)
+	rates = ['%.4f %s' % (0.05 + 0.1*rng.rand(), SPECS[i % len(SPECS)]) 
+		for i in range(1000)]
+	book = RateBook.from_specs(rates).take(rng.randint(0, len(rates), n))
+	starts = np.datetime64('2015-01-02') + rng.randint(0, 60, n)
+	ends = starts + rng.randint(1, 10000, n)
+	amounts = rng.uniform(1, 1000, n)
+	return amounts, starts, ends, book
+
+def main(n, max_workers):
+	amounts, starts, ends, book = portfolio(n)
+	curve = YieldCurve('2015-01-02', ['2016-01-04', '2020-01-02', '2045-01-02'],
+		[0.12, 0.11, 0.1], 'annual compounded business/252 calANBIMA')
+	for name, discount in (('rate book', book), ('yield curve', curve)):
+		print('%s, %d rows' % (name, n))
+		print('  %7s %10s %12s %8s %9s' % ('workers', 'seconds', 'rows/s', 
+			'speedup', 'identical'))
+		serial = None
+		for workers in range(1, max_workers + 1):
+			start = time.time()
+			values, total = present_value(amounts, starts, ends, discount, workers)
+			seconds = time.time() - start
+			if serial is None:
+				serial = values, total, seconds
+			identical = np.array_equal(values, serial[0]) and total == serial[1]
+			print('  %7d %10.3f %12.0f %8.2f %9s' % (workers, seconds, n/seconds,
+				serial[2]/seconds, identical))
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000,
+		int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count())
@@ -1,9 +1,25 @@
 
-import re
 import os
+import sys
+import time
+import struct
+import itertools
+from collections import OrderedDict
 from datetime import datetime, date, timedelta
-from math import exp
-from bizdays import Calendar
+import numpy as np
+# bizdays is imported on first use of fixedincome.Calendar (see __getattr__),
+# re and the modules used by a single feature (csv, mmap, tempfile...) by
+# that feature and the calendars are loaded by the registry (see prewarm)
+if sys.version_info < (3, 7):
+	from bizdays import Calendar
+
+def __getattr__(name):
+	# lazy attributes of the module, Python 3.7+ (PEP 562)
+	if name == 'Calendar':
+		from bizdays import Calendar
+		globals()['Calendar'] = Calendar
+		return Calendar
+	raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 def ir(irspec):
 	"""
@@ -22,35 +38,197 @@ def ir(irspec):
 	- daycount
 	and depending on which daycount is used the calendar must be set. Otherwise,
 	it defaults to None.
+	
+	Parsed specifications are cached (see ir_cache and ir_templates): an
+	identical specification returns the same immutable InterestRate and
+	specifications differing only in the rate share the parsed conventions.
+	A cached rate with a calendar is returned as long as the calendars
+	registry holds the same calendar, which it checks against its file at
+	most once every calendars.interval seconds, so hits stay in memory.
+	"""
+	cached = ir_cache.get(irspec)
+	if cached is not None and (cached.calendar is None or 
+			cached.calendar is calendars.get(cached.calendar.name)):
+		return cached
+	rate = None
+	conventions = []
+	for tok in _tokens(irspec):
+		if _RATE_RE.match(tok):
+			rate = float(tok)
+		else:
+			conventions.append(tok)
+	conventions = tuple(conventions)
+	template = ir_templates.get(conventions)
+	if template is None:
+		template = _parse_conventions(irspec, conventions)
+		ir_templates.set(conventions, template)
+	if rate is None:
+		raise Exception('Invalid interest rate specification: %s' % irspec)
+	frequency, compounding, daycount, calname = template
+	calendar = calendars.get(calname) if calname is not None else None
+	ir_ = InterestRate(rate, frequency, compounding, daycount, calendar)
+	ir_cache.set(irspec, ir_)
+	return ir_
+
+def _tokens(irspec):
+	"""
+	Return the tokens of an interest rate specification, the day counts whose
+	names contain spaces (30/360 US) kept as a single token.
+	"""
+	words = irspec.split()
+	tokens = []
+	i = 0
+	while i < len(words):
+		for name in _SPACED_DAYCOUNTS:
+			if words[i:i + len(name)] == name:
+				tokens.append(' '.join(name))
+				i += len(name)
+				break
+		else:
+			tokens.append(words[i])
+			i += 1
+	return tokens
+
+def _parse_conventions(irspec, tokens):
+	"""
+	Return the (frequency, compounding, daycount, calendar name) template for
+	the convention tokens of an interest rate specification.
 	"""
-	calendar = None
-	tokens = irspec.split()
+	frequency = compounding = daycount = calname = None
 	for tok in tokens:
-		m = re.match('^(\d+)(\.\d+)?$', tok)
-		if m:
-			rate = float(m.group())
-		elif tok in Compounding.names:
+		if tok in Compounding.names:
 			compounding = Compounding(tok)
 		elif tok in DayCount.names:
 			daycount = DayCount(tok)
 		elif tok in Frequency.names:
 			frequency = Frequency(tok)
 		elif tok.startswith('cal'):
-			calendar = Calendar(tok.replace('cal', ''))
-	return InterestRate(rate, frequency, compounding, daycount, calendar)
+			calname = tok[3:]
+		else:
+			raise Exception('Invalid interest rate specification: %s' % irspec)
+	if frequency is None or compounding is None or daycount is None:
+		raise Exception('Invalid interest rate specification: %s' % irspec)
+	return (frequency, compounding, daycount, calname)
+
+def _as_rate(spec):
+	"""
+	Return spec if it is an InterestRate, otherwise the InterestRate for the
+	specification, which may omit the rate (it is set to 0) when only the
+	conventions matter.
+	"""
+	if isinstance(spec, InterestRate):
+		return spec
+	if not any(_RATE_RE.match(tok) for tok in spec.split()):
+		spec = '0 ' + spec
+	return ir(spec)
+
+def _as_convention(cls, value, default):
+	"""Return the cls convention for value: a name, an instance or None."""
+	if value is None:
+		return default
+	if isinstance(value, cls):
+		return value
+	return cls(value)
+
+def convert(rates, periods, source, target, unit='day'):
+	"""
+	Convert arrays of rates in one vectorized pass: rates quoted under the
+	source conventions are converted to the target conventions, equating
+	the compounding factors over periods (one period per rate, anything 
+	accepted by period_array). source and target are InterestRate objects or
+	specifications without rate, like 'annual compounded business/252 calANBIMA'.
+	Returns the array of converted rates.
+	"""
+	source = _as_rate(source)
+	target = _as_rate(target)
+	rate = InterestRate(np.asarray(rates, dtype=np.float64), source.frequency,
+		source.compounding, source.daycount, source.calendar)
+	return rate.convert(target.frequency, target.compounding, target.daycount,
+		target.calendar, periods, unit).rate
+
+def implied_rate(factors, periods, convention, unit='day'):
+	"""
+	Return the rates which yield the compounding factors over periods under
+	convention (an InterestRate or a specification without rate), the 
+	closed-form inverse of InterestRate.compound. periods is a single period
+	or anything accepted by period_array. For the price of a zero coupon 
+	paying 1 the compounding factor is 1/price.
+	"""
+	rate = _as_rate(convention)
+	if not isinstance(periods, GenericPeriod) or isinstance(periods, PeriodArray):
+		periods = period_array(periods, unit)
+	return rate.compounding.implied(factors, rate._timefreq(periods))
+
+def yield_to_maturity(prices, amounts, times, offsets, compounding='compounded',
+		guess=0.1, bounds=(-0.99, 10.0), tol=1e-12, maxiter=100):
+	"""
+	Solve, for many instruments in lockstep, the rates r which discount
+	their cashflows to their prices:
+	
+		prices[i] = sum(amounts[k]/compounding(r[i], times[k]))
+	
+	The cashflows of every instrument are flattened into the amounts and 
+	times arrays, instrument i owning the slice starting at offsets[i] (as in
+	np.add.reduceat), times being given in the frequency of the rates (see
+	DayCount.timefreq). Each instrument needs at least one cashflow.
+	
+	Newton steps are safeguarded by a bracket, which starts at bounds and 
+	shrinks every iteration: steps leaving it fall back to bisection. 
+	Returns the rates and a boolean array flagging the converged ones.
+	"""
+	compounding = _as_convention(Compounding, compounding, None)
+	prices = np.asarray(prices, dtype=np.float64)
+	amounts = np.asarray(amounts, dtype=np.float64)
+	times = np.asarray(times, dtype=np.float64)
+	offsets = np.asarray(offsets, dtype=np.int64)
+	owner = np.repeat(np.arange(len(offsets)), 
+		np.diff(np.append(offsets, len(amounts))))
+	r = np.full(len(prices), guess, dtype=np.float64)
+	lo = np.full(len(prices), bounds[0], dtype=np.float64)
+	hi = np.full(len(prices), bounds[1], dtype=np.float64)
+	converged = np.zeros(len(prices), dtype=bool)
+	with np.errstate(all='ignore'):
+		for i in range(maxiter):
+			rk = r[owner]
+			f = compounding.many(rk, times)
+			pv = np.add.reduceat(amounts/f, offsets)
+			dpv = np.add.reduceat(-amounts*compounding.derivative(rk, times)/(f*f),
+				offsets)
+			g = pv - prices
+			converged |= np.abs(g) <= tol*np.maximum(np.abs(prices), 1.0)
+			if converged.all():
+				break
+			# the present value decreases with the rate
+			lo = np.where(g > 0, r, lo)
+			hi = np.where(g < 0, r, hi)
+			step = r - g/dpv
+			bisect = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+			step = np.where(bisect, (lo + hi)/2, step)
+			r = np.where(converged, r, step)
+	return r, converged
 
-def compound(ir, period):
+def compound(ir, period, unit='day'):
 	"""
 	Return the compounding factor regarding an interst rate and a period.
+	
+	If period is a PeriodArray (or anything accepted by period_array) the
+	compounding factors are returned as a NumPy array.
 	"""
-	return ir.compound(period)
+	if isinstance(period, GenericPeriod) and not isinstance(period, PeriodArray):
+		return ir.compound(period)
+	return ir.compound_many(period, unit)
 
 
-def discount(ir, period):
+def discount(ir, period, unit='day'):
 	"""
 	Return the discount factor regarding an interest rate and a period.
+	
+	If period is a PeriodArray (or anything accepted by period_array) the
+	discount factors are returned as a NumPy array.
 	"""
-	return ir.discount(period)
+	if isinstance(period, GenericPeriod) and not isinstance(period, PeriodArray):
+		return ir.discount(period)
+	return ir.discount_many(period, unit)
 
 def period(pspec):
 	"""
@@ -68,9 +246,30 @@ def period(pspec):
 		# DateRangePeriod
 		p = period('2012-07-12:2012-07-16')
 		p = period('2012-07-12:2012-07-22')
+	
+	Parsed specifications are cached (see period_cache), a new period 
+	object is returned on every call.
+	"""
+	parsed = _cached_period(pspec)
+	if parsed[0] == 'range':
+		return DateRangePeriod(parsed[1], 'day')
+	else:
+		return FixedTimePeriod(parsed[1], parsed[2])
+
+def _cached_period(pspec):
+	"""Return _parse_period(pspec) through period_cache."""
+	parsed = period_cache.get(pspec)
+	if parsed is None:
+		parsed = _parse_period(pspec)
+		period_cache.set(pspec, parsed)
+	return parsed
+
+def _parse_period(pspec):
+	"""
+	Return ('range', (start, end)) or ('fixed', size, unit) for a period
+	specification string.
 	"""
-	w = '|'.join(TimeUnit.names)
-	m = re.match('^(\d+)(\.\d+)? (%s)s?$' % w, pspec)
+	m = _PERIOD_RE.match(pspec)
 	if m:
 		istimerange = False
 	elif len(pspec.split(':')) == 2:
@@ -82,10 +281,141 @@ def period(pspec):
 	if istimerange:
 		dates = (datetime.strptime(start, '%Y-%m-%d').date(), 
 			datetime.strptime(end, '%Y-%m-%d').date())
-		return DateRangePeriod(dates, 'day')
+		return ('range', dates)
 	else:
 		g = m.groups()
-		return FixedTimePeriod(float(g[0] + (g[1] or '.0')), g[2])
+		return ('fixed', float(g[0] + (g[1] or '.0')), g[2])
+
+def _iso_dates(codes):
+	"""
+	Return the datetime64[D] dates for an (n, 10) array of the character 
+	codes of 'YYYY-MM-DD' strings, computed from their digits.
+	"""
+	# one contiguous row per character, the digits as unsigned numbers, so
+	# that characters below '0' wrap around and are out of range too
+	chars = np.ascontiguousarray(codes.T, dtype=np.uint32)
+	digits = chars - np.uint32(ord('0'))
+	if np.any(digits[:4] > 9) or np.any(digits[5:7] > 9) or \
+			np.any(digits[8:] > 9) or np.any(chars[4] != ord('-')) or \
+			np.any(chars[7] != ord('-')):
+		raise Exception('Invalid period specification')
+	y = (digits[0]*1000 + digits[1]*100 + digits[2]*10 + digits[3]).astype(np.int64)
+	m = (digits[5]*10 + digits[6]).astype(np.int64)
+	d = (digits[8]*10 + digits[9]).astype(np.int64)
+	year_starts = _year_starts()
+	leap = year_starts[y + 1] - year_starts[y] == 366
+	m = np.clip(m, 0, 13)
+	length = _MONTH_DAYS[m] + ((m == 2) & leap)
+	if np.any((m < 1) | (m > 12) | (d < 1) | (d > length)):
+		raise Exception('Invalid period specification')
+	days = year_starts[y] + _MONTH_STARTS[m] + ((m > 2) & leap) + d - 1
+	return days.astype('datetime64[D]')
+
+def parse_periods(specs):
+	"""
+	Parse a sequence (or array) of period specifications at once and return
+	the columns (starts, ends, sizes, units): starts and ends are datetime64[D]
+	arrays (NaT for fixed periods), sizes are the days of the date ranges or
+	the sizes of the fixed periods and units their time units.
+	
+		starts, ends, sizes, units = parse_periods(['2012-07-12:2012-07-16',
+			'3 months'])
+	
+	Date ranges written 'YYYY-MM-DD:YYYY-MM-DD' are converted in one pass
+	from the digits of their fixed width characters, the other 
+	specifications are parsed once per distinct value (see period).
+	"""
+	specs = np.asarray(specs).ravel()
+	if specs.dtype.kind not in 'SU':
+		raise Exception('Invalid period specifications: strings expected')
+	n = len(specs)
+	starts = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+	ends = starts.copy()
+	sizes = np.zeros(n, dtype=np.float64)
+	units = np.full(n, 'day', dtype='U9')
+	# the character codes of the specifications, one row per specification
+	kind = specs.dtype.kind
+	width = specs.dtype.itemsize//(4 if kind == 'U' else 1)
+	codes = specs.view(np.uint32 if kind == 'U' else np.uint8).reshape(n, width)
+	fast = np.zeros(n, dtype=bool)
+	if n and width >= 21:
+		fast = codes[:, 10] == ord(':')
+		if width > 21:
+			fast &= codes[:, 21] == 0
+		starts[fast] = _iso_dates(codes[fast, :10])
+		ends[fast] = _iso_dates(codes[fast, 11:21])
+	others = np.flatnonzero(~fast)
+	if len(others):
+		# bytes are decoded, so that str gives the specifications themselves
+		values, inverse = np.unique(specs[others].astype('U'), return_inverse=True)
+		parsed = [_cached_period(str(v)) for v in values]
+		# fixed periods have no dates, None is converted to NaT
+		starts[others] = np.array([p[1][0] if p[0] == 'range' else None 
+			for p in parsed], dtype='datetime64[D]')[inverse]
+		ends[others] = np.array([p[1][1] if p[0] == 'range' else None 
+			for p in parsed], dtype='datetime64[D]')[inverse]
+		sizes[others] = np.array([0.0 if p[0] == 'range' else p[1] 
+			for p in parsed])[inverse]
+		units[others] = np.array(['day' if p[0] == 'range' else p[2] 
+			for p in parsed], dtype='U9')[inverse]
+	ranges = ~np.isnat(starts)
+	sizes[ranges] = (ends[ranges] - starts[ranges]).astype(np.int64)
+	if np.any(sizes[ranges] < 0):
+		raise Exception('Invalid period: the starting date must be greater \
+			than the ending date.')
+	return starts, ends, sizes, units
+
+def period_array(periods, unit='day'):
+	"""
+	Return a PeriodArray instance for a batch of periods.
+	
+		# DateRangePeriodArray: a (starts, ends) tuple of date arrays
+		p = period_array((['2012-07-12', '2012-07-12'], ['2012-07-16', '2012-07-22']))
+		
+		# FixedTimePeriodArray: an array of sizes given in unit
+		p = period_array([1, 2.5, 3], 'month')
+		
+		# a sequence of DateRangePeriod or FixedTimePeriod objects
+		p = period_array([period('1 month'), period('2 months')])
+		
+		# a sequence of period specifications (see parse_periods)
+		p = period_array(['2012-07-12:2012-07-16', '2012-07-12:2012-07-22'])
+	
+	A PeriodArray is returned unchanged.
+	"""
+	if isinstance(periods, PeriodArray):
+		return periods
+	if isinstance(periods, tuple):
+		return DateRangePeriodArray(periods)
+	periods = list(periods) if not isinstance(periods, np.ndarray) else periods
+	if (isinstance(periods, np.ndarray) and periods.dtype.kind in 'SU') or \
+			(len(periods) and isinstance(periods[0], (str, type(u'')))):
+		return _spec_array(periods)
+	if len(periods) and isinstance(periods[0], DateRangePeriod):
+		return DateRangePeriodArray(([p.dates[0] for p in periods],
+			[p.dates[1] for p in periods]))
+	if len(periods) and isinstance(periods[0], FixedTimePeriod):
+		units = set(p.unit for p in periods)
+		if len(units) > 1:
+			raise Exception('Invalid period array: mixed time units %s' % \
+				', '.join(sorted(units)))
+		return FixedTimePeriodArray([p.size() for p in periods], units.pop())
+	return FixedTimePeriodArray(periods, unit)
+
+
+def _spec_array(specs):
+	"""Return the PeriodArray for a sequence of period specifications."""
+	starts, ends, sizes, units = parse_periods(specs)
+	ranges = ~np.isnat(starts)
+	if ranges.all():
+		return DateRangePeriodArray((starts, ends))
+	if ranges.any():
+		raise Exception('Invalid period array: mixed date ranges and fixed periods')
+	kinds = np.unique(units)
+	if len(kinds) > 1:
+		raise Exception('Invalid period array: mixed time units %s' % \
+			', '.join(str(u) for u in kinds))
+	return FixedTimePeriodArray(sizes, str(kinds[0]))
 
 
 class GenericPeriod(object):
@@ -94,6 +424,8 @@ class GenericPeriod(object):
 	
 	This class accommodates methods for time computing.
 	"""
+	__slots__ = ('unit',)
+	
 	def __init__(self, unit):
 		self.unit = unit
 	
@@ -114,6 +446,8 @@ class FixedTimePeriod(GenericPeriod):
 	period('1 month')
 	period('1 day')
 	"""
+	__slots__ = ('_size',)
+	
 	def __init__(self, size, unit):
 		super(FixedTimePeriod, self).__init__(unit)
 		self._size = size
@@ -141,6 +475,8 @@ class DateRangePeriod(GenericPeriod):
 	
 	This procedure includes starting and ending points.
 	"""
+	__slots__ = ('dates',)
+	
 	def __init__(self, dates, unit='day'):
 		super(DateRangePeriod, self).__init__(unit)
 		if dates[0] > dates[1]:
@@ -158,37 +494,332 @@ class CalendarRangePeriod(DateRangePeriod):
 	A CalendarRangePeriod is a DateRangePeriod which uses a Calendar to
 	compute the amount of days contained into the underlying period.
 	"""
+	__slots__ = ('calendar',)
+	
 	def __init__(self, period, calendar):
 		super(CalendarRangePeriod, self).__init__(period.dates, unit='day')
 		self.calendar = calendar
 	
 	def size(self):
 		'Return the amount of working days into period.'
+		index = calendar_index(self.calendar)
+		if index is not None:
+			return index.bizdays(self.dates)
 		d1 = self.dates[0].isoformat()
 		d2 = self.dates[1].isoformat()
 		return self.calendar.bizdays((d1, d2))
 
 
-class DayCount(object):
-	"""DayCount"""
+class PeriodArray(GenericPeriod):
+	"""
+	PeriodArray class
+	
+	Columnar counterpart of GenericPeriod: size() returns a NumPy array with
+	one entry per period, all of them sharing the same time unit. DayCount
+	and InterestRate handle these objects exactly as they handle single
+	periods, so every computation runs as one vectorized expression.
+	"""
+	__slots__ = ()
+	
+	def __len__(self):
+		return len(self.size())
+	
+	def __str__(self):
+		return '%d periods in %ss' % (len(self), self.unit)
+
+
+class FixedTimePeriodArray(PeriodArray):
+	"""
+	period_array([1, 2.5, 3], 'month')
+	"""
+	__slots__ = ('_sizes',)
+	
+	def __init__(self, sizes, unit):
+		super(FixedTimePeriodArray, self).__init__(unit)
+		self._sizes = np.asarray(sizes, dtype=np.float64)
+	
+	def size(self):
+		"""Return the quantities related to the fixed periods."""
+		return self._sizes
+	
+	def __getitem__(self, index):
+		return FixedTimePeriodArray(self._sizes[index], self.unit)
+
+
+class DateRangePeriodArray(PeriodArray):
+	"""
+	starts = ['2012-07-12', '2012-07-12']
+	ends = ['2012-07-16', '2012-07-22']
+	period_array((starts, ends))
+	
+	The dates are stored as datetime64[D] arrays, so anything NumPy converts
+	to dates (ISO strings, date objects, datetime64) is accepted.
+	"""
+	__slots__ = ('dates',)
+	
+	def __init__(self, dates, unit='day'):
+		super(DateRangePeriodArray, self).__init__(unit)
+		starts = np.asarray(dates[0], dtype='datetime64[D]')
+		ends = np.asarray(dates[1], dtype='datetime64[D]')
+		if starts.shape != ends.shape:
+			raise Exception('Invalid period array: starting and ending dates \
+				must have the same shape.')
+		if np.any(starts > ends):
+			raise Exception('Invalid period: the starting date must be greater \
+				than the ending date.')
+		self.dates = (starts, ends)
+	
+	def size(self):
+		"""Return the total amount of days between the pairs of dates"""
+		return (self.dates[1] - self.dates[0]).astype(np.int64)
+	
+	def __getitem__(self, index):
+		return DateRangePeriodArray((self.dates[0][index], self.dates[1][index]),
+			self.unit)
+
+
+class CalendarRangePeriodArray(DateRangePeriodArray):
+	"""
+	Columnar counterpart of CalendarRangePeriod.
+	"""
+	__slots__ = ('calendar',)
+	
+	def __init__(self, period, calendar):
+		super(CalendarRangePeriodArray, self).__init__(period.dates, unit='day')
+		self.calendar = calendar
+	
+	def size(self):
+		'Return the amount of working days into each period.'
+		index = calendar_index(self.calendar)
+		if index is not None:
+			return index.bizdays_many(self.dates[0], self.dates[1])
+		d1 = self.dates[0].astype(str)
+		d2 = self.dates[1].astype(str)
+		return np.array([self.calendar.bizdays(d) for d in zip(d1, d2)],
+			dtype=np.int64)
+	
+	def __getitem__(self, index):
+		return CalendarRangePeriodArray(
+			super(CalendarRangePeriodArray, self).__getitem__(index), self.calendar)
+
+
+class Convention(object):
+	"""
+	Convention class
+	
+	Base class of DayCount, Frequency and Compounding. Conventions are 
+	interned flyweights: there is one immutable instance per name, shared by
+	every InterestRate using it. Subclasses define names, _kind (used in error
+	messages) and _setup, which builds the instance's tables once.
+	"""
+	__slots__ = ('_name',)
+	
+	def __new__(cls, name):
+		instances = cls.__dict__['_instances']
+		try:
+			return instances[name]
+		except KeyError:
+			pass
+		if name not in cls.names:
+			raise Exception('Invalid %s: %s' % (cls._kind, name))
+		self = super(Convention, cls).__new__(cls)
+		self._name = name
+		self._setup()
+		instances[name] = self
+		return self
+	
+	def _setup(self):
+		pass
+	
+	def __reduce__(self):
+		return (self.__class__, (self._name,))
+	
+	def __get_name(self):
+		return self._name
+	name = property(__get_name)
+	
+	def __eq__(self, other):
+		return isinstance(other, self.__class__) and self._name == other._name
+	
+	def __ne__(self, other):
+		return not self == other
+	
+	def __hash__(self):
+		return hash(self._name)
+	
+	def __repr__(self):
+		return '%s(%r)' % (self.__class__.__name__, self._name)
+
+
+def _isleap(y):
+	return (y % 4 == 0) & ((y % 100 != 0) | (y % 400 == 0))
+
+def _ymd(dates):
+	"""
+	Decompose an array of dates into years, months, days and end of month
+	flags, the fields used by the 30/360 day counts, with integer arithmetic
+	on the days since the epoch (the civil from days algorithm, in eras of
+	400 years starting on March 1st). A date object gives Python numbers.
+	"""
+	if isinstance(dates, date):
+		return dates.year, dates.month, dates.day, \
+			(dates + timedelta(1)).month != dates.month
+	z = np.asarray(dates, dtype='datetime64[D]').astype(np.int64) + 719468
+	era = z//146097
+	doe = z - era*146097
+	yoe = (doe - doe//1460 + doe//36524 - doe//146096)//365
+	doy = doe - (365*yoe + yoe//4 - yoe//100)
+	mp = (5*doy + 2)//153
+	d = doy - (153*mp + 2)//5 + 1
+	m = (mp + 2) % 12 + 1
+	y = yoe + era*400 + (m <= 2)
+	eom = d == _MONTH_DAYS[m] + ((m == 2) & _isleap(y))
+	return y, m, d, eom
+
+def _leapdays(dates):
+	"""
+	Return how many February 29th there are from 0000-03-01 up to dates.
+	Dates from 1900 to 2200 are looked up in a table.
+	"""
+	if isinstance(dates, date):
+		n = dates.year - 1
+		return n//4 - n//100 + n//400 + (_isleap(dates.year) and 
+			(dates.month > 2 or dates.month == 2 and dates.day == 29))
+	days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+	i = days - _SPAN_START
+	if i.size == 0 or (i.min() >= 0 and i.max() < _SPAN_END - _SPAN_START):
+		return _leapdays_table()[i]
+	return _count_leapdays(days)
+
+def _count_leapdays(days):
+	# in eras of 400 years starting on March 1st (see _ymd), a February 29th
+	# is the last day of a year
+	z = days + 719468
+	era = z//146097
+	doe = z - era*146097
+	yoe = (doe - doe//1460 + doe//36524 - doe//146096)//365
+	doy = doe - (365*yoe + yoe//4 - yoe//100)
+	return era*97 + yoe//4 - yoe//100 + (doy == 365)
+
+def _leapdays_table():
+	global _LEAPDAYS
+	if _LEAPDAYS is None:
+		_LEAPDAYS = _count_leapdays(np.arange(_SPAN_START, _SPAN_END)).astype(np.int32)
+	return _LEAPDAYS
+
+# days since the epoch of 1900-01-01 and 2201-01-01, the span of the tables
+# of date fields built on first use: 30/360 fields (see _fields_360), packed
+# into int32 as ((360*year + 30*month)*32 + day)*4 + end of month*2 + february,
+# and counts of February 29th (see _leapdays)
+_SPAN_START = -25567
+_SPAN_END = 84371
+_FIELDS_360 = None
+_LEAPDAYS = None
+
+def _fields_360(dates):
+	"""
+	Return the fields of dates used by the 30/360 day counts: 360*year +
+	30*month, the day, and the end of month and february flags. Dates from
+	1900 to 2200 are looked up in a table, other ones computed by _ymd.
+	"""
+	if not isinstance(dates, date):
+		days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+		i = days - _SPAN_START
+		if i.size == 0 or (i.min() >= 0 and i.max() < _SPAN_END - _SPAN_START):
+			code = _fields_360_table()[i]
+			return code >> 7, (code >> 2) & 31, (code & 2) != 0, (code & 1) != 0
+	y, m, d, eom = _ymd(dates)
+	return 360*y + 30*m, d, eom, m == 2
+
+def _fields_360_table():
+	global _FIELDS_360
+	if _FIELDS_360 is None:
+		days = np.arange(_SPAN_START, _SPAN_END).astype('datetime64[D]')
+		y, m, d, eom = _ymd(days)
+		_FIELDS_360 = (((360*y + 30*m)*32 + d)*4 + eom*2 + (m == 2)).astype(np.int32)
+	return _FIELDS_360
+
+# the kernels below take the fields of _fields_360 and use arithmetic on
+# booleans (d - (d == 31) turns 31 into 30), so they apply to numbers as well
+# as to arrays
+
+def _days_30_360(start, end):
+	"""30/360 (bond basis): 31 is 30, at the end only if it starts at 30 or 31."""
+	b1, d1, eom1, feb1 = start
+	b2, d2, eom2, feb2 = end
+	d1 = d1 - (d1 == 31)
+	d2 = d2 - ((d2 == 31) & (d1 == 30))
+	return (b2 + d2) - (b1 + d1)
+
+def _days_30_360_us(start, end):
+	"""30/360 US: bond basis, the end of February counting as 30."""
+	b1, d1, eom1, feb1 = start
+	b2, d2, eom2, feb2 = end
+	feb1 = feb1 & eom1
+	feb2 = feb2 & eom2
+	d2 = d2 + (feb1 & feb2)*(30 - d2)
+	d1 = d1 + feb1*(30 - d1)
+	d2 = d2 - ((d2 == 31) & (d1 >= 30))
+	d1 = d1 - (d1 == 31)
+	return (b2 + d2) - (b1 + d1)
+
+def _days_30e_360_isda(start, end):
+	"""
+	30E/360 ISDA: the last day of every month is 30. The ending date is not
+	taken as the termination date, so the end of February is always 30.
+	"""
+	b1, d1, eom1, feb1 = start
+	b2, d2, eom2, feb2 = end
+	d1 = d1 + eom1*(30 - d1)
+	d2 = d2 + eom2*(30 - d2)
+	return (b2 + d2) - (b1 + d1)
+
+def _days_30e_plus_360(start, end):
+	"""
+	30E+/360: 31 is 30 at the start, an ending 31 is the 1st of the next 
+	month, which counts exactly as 31 does.
+	"""
+	b1, d1, eom1, feb1 = start
+	b2, d2, eom2, feb2 = end
+	return (b2 + d2) - (b1 + d1 - (d1 == 31))
+
+
+class DayCount(Convention):
+	"""
+	DayCount
+	
+	The 30/360 family counts the days between dates from their years, months
+	and days (see the _days_* kernels). actual/365L (ISDA) uses 366 days in
+	the base when the period includes a February 29th, for annual rates or
+	when no frequency is given, and when the ending date falls in a leap
+	year for other frequencies. Both apply to periods with dates, periods
+	given in days are counted as they are.
+	"""
+	__slots__ = ('_daysinbase', '_unitsize', '_unit_convert', '_kernel')
+	_kind = 'day count'
+	_instances = {}
 	_daycounts = {
-		'30/360': None,
-		'30/360 US': None,
-		'30E/360 ISDA': None,
-		'30E+/360': None, 
+		'30/360': 360,
+		'30/360 US': 360,
+		'30E/360 ISDA': 360,
+		'30E+/360': 360, 
 		'actual/365': 365,
 		'actual/360': 360,
 		'actual/364': 364,
 		'actual/365L': 365,
 		'business/252': 252
 	}
+	# day counts between decomposed dates, for the rules not counting days
+	_kernels = {
+		'30/360': _days_30_360,
+		'30/360 US': _days_30_360_us,
+		'30E/360 ISDA': _days_30e_360_isda,
+		'30E+/360': _days_30e_plus_360
+	}
 	
-	def __init__(self, dc):
-		if dc not in self.names:
-			raise Exception('Invalid day count: %s' % dc)
-		self._name = dc
-		self._daycount = dc
-		self._daysinbase = self._daycounts[dc]
+	def _setup(self):
+		self._daysinbase = self._daycounts[self._name]
+		self._kernel = self._kernels.get(self._name)
 		self._unitsize = { # frequency multiplier
 			'year': 1,
 			'half-year': 2,
@@ -241,13 +872,6 @@ class DayCount(object):
 		return self._daysinbase
 	daysinbase = property(__getdaysinbase)
 	
-	def __get_name(self):
-		return self._name
-	name = property(__get_name)
-	
-	def __eq__(self, other):
-		return self._daycount == other._daycount
-	
 	def in_unit(self, period, unit):
 		'''
 		Returns the size of the period converted to the given unit.
@@ -300,25 +924,58 @@ class DayCount(object):
 		"""
 		return self._unitsize[unit]
 	
-	def timefactor(self, period):
+	def days(self, starts, ends):
+		"""
+		Return the day counts between dates (or arrays of dates) under this 
+		rule: 30/360 days for that family, actual days otherwise.
+		"""
+		if self._kernel is not None:
+			return self._kernel(_fields_360(starts), _fields_360(ends))
+		ends = np.asarray(ends, dtype='datetime64[D]')
+		return (ends - np.asarray(starts, dtype='datetime64[D]')).astype(np.int64)
+	
+	def timefactor(self, period, frequency=None):
 		"""
 		Returns an year fraction regarding period definition.
-		This function always returns year's fraction.
+		This function always returns year's fraction. frequency is only used
+		by actual/365L (see DayCount).
 		"""
-		days = period.size() * self.daysinunit(period.unit)
-		return float(days)/self.daysinbase
+		dated = isinstance(period, (DateRangePeriod, DateRangePeriodArray)) and \
+			not isinstance(period, (CalendarRangePeriod, CalendarRangePeriodArray))
+		if dated and self._kernel is not None:
+			tf = self.days(period.dates[0], period.dates[1])/float(self.daysinbase)
+		elif dated and self._name == 'actual/365L':
+			start, end = period.dates
+			if frequency is None or frequency.name == 'annual':
+				leap = _leapdays(end) > _leapdays(start)
+			elif isinstance(end, date):
+				leap = _isleap(end.year)
+			else:
+				leap = _isleap(np.asarray(end, dtype='datetime64[Y]').astype(
+					np.int64) + 1970)
+			tf = period.size()/(365.0 + leap)
+		else:
+			days = period.size() * self.daysinunit(period.unit)
+			return days/float(self.daysinbase)
+		return tf if isinstance(period, PeriodArray) else float(tf)
 	
 	def timefreq(self, period, frequency):
 		"""
 		timefreq returns the amount of time contained into the period adjusted 
 		to the given frequency.
 		"""
-		tf = self.timefactor(period)
+		tf = self.timefactor(period, frequency)
 		return tf * self.unitsize(frequency.unit())
 
 DayCount.names = tuple(DayCount._daycounts.keys())
+# the words of the day count names with spaces, the longest first (see _tokens)
+_SPACED_DAYCOUNTS = sorted([name.split() for name in DayCount.names if ' ' in name],
+	key=len, reverse=True)
 
-class Frequency(object):
+class Frequency(Convention):
+	__slots__ = ()
+	_kind = 'frequency'
+	_instances = {}
 	_units = { # frequency to time unit mapping
 		# adjective : noun
 		'annual': 'year',
@@ -328,20 +985,8 @@ class Frequency(object):
 		'daily': 'day'
 	}
 	
-	def __init__(self, name):
-		if name not in self.names:
-			raise Exception('Invalid frequency: %s' % name)
-		self._name = name
-	
-	def __eq__(self, other):
-		return self.name == other.name
-	
-	def __get_name(self):
-		return self._name
-	name = property(__get_name)
-	
 	def unit(self):
-		return self._units[self.name]
+		return self._units[self._name]
 	
 Frequency.names = tuple(Frequency._units.keys())
 
@@ -349,31 +994,102 @@ Frequency.names = tuple(Frequency._units.keys())
 class TimeUnit(object):
 	names = tuple(Frequency._units.values())
 
+# days in the months of a common year and days before them, indexed from 1
+_MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31, 0])
+_MONTH_STARTS = np.concatenate(([0], np.cumsum(_MONTH_DAYS)[:-1]))
+# datetime64[D] days of the first of january of the years 0 to 10000, built
+# on first use (see _year_starts)
+_YEAR_STARTS = None
+
+def _year_starts():
+	global _YEAR_STARTS
+	if _YEAR_STARTS is None:
+		_YEAR_STARTS = np.arange(-1970, 8031).astype('datetime64[Y]').astype(
+			'datetime64[D]').astype(np.int64)
+	return _YEAR_STARTS
+
+# months between payments for the frequencies used in schedules
+_FREQUENCY_MONTHS = {'annual': 12, 'semi-annual': 6, 'quarterly': 3, 'monthly': 1}
+
+class _LazyPattern(object):
+	"""
+	A regular expression compiled, importing re, on first use. Its methods
+	are then bound to the instance, so they are looked up as fast as the
+	compiled pattern's.
+	"""
+	def __init__(self, pattern):
+		self._pattern = pattern
+	
+	def __getattr__(self, name):
+		import re
+		value = getattr(re.compile(self._pattern), name)
+		setattr(self, name, value)
+		return value
+
+_RATE_RE = _LazyPattern(r'^(\d+)(\.\d+)?$')
+_PERIOD_RE = _LazyPattern(r'^(\d+)(\.\d+)? (%s)s?$' % '|'.join(TimeUnit.names))
 
-class Compounding(object):
+
+class Compounding(Convention):
+	__slots__ = ('_func', '_invfunc', '_dfunc')
+	_kind = 'compounding'
+	_instances = {}
+	# NumPy ufuncs handle scalars and arrays alike, so __call__ and many share
+	# the very same kernels and their results match bit for bit.
 	_funcs = {
 		'simple': lambda r,t: 1 + r*t,
-		'compounded': lambda r,t: (1 + r)**t,
-		'continuous': lambda r,t: exp(r*t)
+		'compounded': lambda r,t: np.power(1 + r, t),
+		'continuous': lambda r,t: np.exp(r*t)
 	}
-	def __init__(self, name):
-		if name not in self.names:
-			raise Exception('Invalid compounding: %s' % name)
-		self._name = name
+	# inverses of _funcs: the rate which yields the factor f over t
+	_invfuncs = {
+		'simple': lambda f,t: (f - 1)/t,
+		'compounded': lambda f,t: np.power(f, 1/t) - 1,
+		'continuous': lambda f,t: np.log(f)/t
+	}
+	
+	# derivatives of _funcs with respect to the rate
+	_dfuncs = {
+		'simple': lambda r,t: t + 0*r,
+		'compounded': lambda r,t: t*np.power(1 + r, t - 1),
+		'continuous': lambda r,t: t*np.exp(r*t)
+	}
+	
+	def _setup(self):
+		self._func = self._funcs[self._name]
+		self._invfunc = self._invfuncs[self._name]
+		self._dfunc = self._dfuncs[self._name]
 	
 	def __call__(self, r, t):
-		return self._funcs[self.name](r, t)
+		return self._func(r, t)
 	
-	def __eq__(self, other):
-		return self.name == other.name
+	def many(self, r, t):
+		"""
+		Vectorized version of __call__: r and t may be NumPy arrays (or
+		scalars) and are broadcast against each other.
+		"""
+		return self._func(np.asarray(r, dtype=np.float64),
+			np.asarray(t, dtype=np.float64))
 	
-	def __get_name(self):
-		return self._name
-	name = property(__get_name)
+	def derivative(self, r, t):
+		"""
+		Return the derivative of the compounding factor with respect to the
+		rate r, over t. r and t may be NumPy arrays.
+		"""
+		return self._dfunc(np.asarray(r, dtype=np.float64),
+			np.asarray(t, dtype=np.float64))
+	
+	def implied(self, f, t):
+		"""
+		Return the rate which yields the compounding factor f over t, the
+		inverse of __call__. f and t may be NumPy arrays.
+		"""
+		return self._invfunc(np.asarray(f, dtype=np.float64),
+			np.asarray(t, dtype=np.float64))
 	
 # TODO: This code is a malign hack. I might use a metaclass here.
 Compounding.names = tuple([i for i in Compounding._funcs.keys()])
-for k,v in Compounding._funcs.iteritems():
+for k,v in Compounding._funcs.items():
 	setattr(Compounding, k, staticmethod(v))
 
 
@@ -387,30 +1103,2036 @@ class InterestRate(object):
 	given market, we are likely to handle the situation where interest rate 
 	has its own calendar and that calendar must be used to discount the
 	cashflows.
+	
+	The times of date range periods can be memoized in an LRUCache, keyed
+	by the conventions, the calendar and the dates: cache is the LRUCache of
+	this rate, timefreq_cache (disabled by default, with maxsize 0) is used
+	when it is None. Enable it globally with timefreq_cache.resize(n). It 
+	pays off for business day counts, actual ones are as cheap as a lookup.
+	
+	The compounding (and so discount) factors of date range periods can be
+	memoized in factor_cache, a TTLCache (disabled by default), keyed by the
+	conventions, the calendar name, the rate and the dates. Enable it with
+	factor_cache.resize(n) and factor_cache.set_ttl(seconds). Entries hold
+	the calendar index they were computed with, so the ones of a calendar
+	reloaded by the registry are dropped when met.
 	"""
-	# TODO write conversion functions: given other settings generate a different rate
-	def __init__(self, rate, frequency, compounding, daycount, calendar=None):
-		self.rate = rate
-		self.frequency = frequency
-		self.daycount = daycount
-		self.compounding = compounding
-		self.daycount = daycount
-		self.calendar = calendar
+	__slots__ = ('_rate', '_frequency', '_compounding', '_daycount', '_calendar',
+		'_cache')
+	
+	def __init__(self, rate, frequency, compounding, daycount, calendar=None,
+			cache=None):
+		self._rate = rate
+		self._frequency = frequency
+		self._compounding = compounding
+		self._daycount = daycount
+		self._calendar = calendar
+		self._cache = cache
 		if self.calendar and not self.daycount.name.startswith('business'):
 			raise Exception("%s DayCount cannot accept calendar" % \
 				self.daycount.name)
 	
+	def __get_rate(self):
+		return self._rate
+	rate = property(__get_rate)
+	
+	def __get_frequency(self):
+		return self._frequency
+	frequency = property(__get_frequency)
+	
+	def __get_compounding(self):
+		return self._compounding
+	compounding = property(__get_compounding)
+	
+	def __get_daycount(self):
+		return self._daycount
+	daycount = property(__get_daycount)
+	
+	def __get_calendar(self):
+		return self._calendar
+	calendar = property(__get_calendar)
+	
+	def __get_cache(self):
+		return self._cache
+	cache = property(__get_cache)
+	
 	def discount(self, period):
 		"""Return the discount factor"""
-		return 1.0/compound(period)
+		return 1.0/self.compound(period)
 	
 	def compound(self, period):
 		"""Return the compounding factor"""
+		if factor_cache.maxsize and isinstance(period, DateRangePeriod) and \
+				not isinstance(self.rate, np.ndarray):
+			return self._cached_compound(period)
+		return self.compounding(self.rate, self._timefreq(period))
+	
+	def _cached_compound(self, period):
+		"""
+		compound through factor_cache. An entry computed with another index
+		of its calendar (reloaded since) is discarded.
+		"""
+		calendar = self.calendar or getattr(period, 'calendar', None)
+		index = calendar_index(calendar) if calendar else None
+		key = (self.frequency, self.compounding, self.daycount, 
+			getattr(calendar, 'name', None), self.rate, 
+			_ordinal(period.dates[0]), _ordinal(period.dates[1]))
+		entry = factor_cache.get(key)
+		if entry is not None:
+			if entry[0] is index:
+				return entry[1]
+			factor_cache.discard(key)
+		factor = self.compounding(self.rate, self._timefreq(period))
+		factor_cache.set(key, (index, factor))
+		return factor
+	
+	def discount_many(self, periods, unit='day'):
+		"""Return the discount factors for an array of periods"""
+		return 1.0/self.compound_many(periods, unit)
+	
+	def compound_many(self, periods, unit='day'):
+		"""
+		Return the compounding factors for an array of periods.
+		
+		periods is anything accepted by period_array: a PeriodArray, a
+		(starts, ends) tuple of date arrays or an array of sizes given in unit.
+		The factors match, element by element, the ones returned by compound.
+		"""
+		periods = period_array(periods, unit)
+		return self.compounding.many(self.rate, self._timefreq(periods))
+	
+	def _timefreq(self, period):
+		"""
+		Return the time contained into period (a single period or a
+		PeriodArray) in the rate's frequency, counting business days when the
+		rate has a calendar.
+		"""
+		if isinstance(period, DateRangePeriod):
+			cache = self._cache if self._cache is not None else timefreq_cache
+			if cache.maxsize:
+				return self._cached_timefreq(period, cache)
+		if self.calendar:
+			if isinstance(period, DateRangePeriodArray):
+				period = CalendarRangePeriodArray(period, self.calendar)
+			elif isinstance(period, DateRangePeriod):
+				period = CalendarRangePeriod(period, self.calendar)
+		return self.daycount.timefreq(period, self.frequency)
+	
+	def _cached_timefreq(self, period, cache):
+		"""
+		_timefreq through cache. The key holds the identity of the calendar
+		index, which the entry keeps alive, so a reloaded calendar (a new
+		index) never hits entries computed with the former one.
+		"""
+		calendar = self.calendar or getattr(period, 'calendar', None)
+		index = calendar_index(calendar) if calendar else None
+		key = (self.daycount, self.frequency, getattr(calendar, 'name', None),
+			id(index), _ordinal(period.dates[0]), _ordinal(period.dates[1]))
+		entry = cache.get(key)
+		if entry is not None and entry[0] is index:
+			return entry[1]
 		if self.calendar:
 			period = CalendarRangePeriod(period, self.calendar)
+		tf = self.daycount.timefreq(period, self.frequency)
+		cache.set(key, (index, tf))
+		return tf
+	
+	def convert(self, frequency=None, compounding=None, daycount=None, 
+			calendar=None, period=None, unit='day'):
+		"""
+		Return an InterestRate with the given conventions (names or objects,
+		unset ones are kept) yielding the same compounding factor as this 
+		one over period. The calendar is kept for business day counts and may
+		be given by name.
 		
-		t = self.daycount.timefreq(period, self.frequency)
-		return self.compounding(self.rate, t)
+		period may be a single period or anything accepted by period_array,
+		in which case the converted rates form an array: one per period. It
+		can be omitted only when the conversion does not depend on it, that
+		is, for the same day count and calendar, unless simple compounding is
+		converted to (or from) another compounding.
+		"""
+		frequency = _as_convention(Frequency, frequency, self.frequency)
+		compounding = _as_convention(Compounding, compounding, self.compounding)
+		daycount = _as_convention(DayCount, daycount, self.daycount)
+		if calendar is None:
+			if daycount.name.startswith('business'):
+				calendar = self.calendar
+		elif isinstance(calendar, str):
+			calendar = calendars.get(calendar)
+		target = InterestRate(0.0, frequency, compounding, daycount, calendar)
+		if period is None:
+			if daycount != self.daycount or calendar != self.calendar or \
+					('simple' in (compounding.name, self.compounding.name) and
+					compounding != self.compounding):
+				raise Exception('Invalid conversion: a period is required to \
+					convert from %s to %s' % (self, target))
+			period = FixedTimePeriod(1, 'year')
+		if isinstance(period, GenericPeriod) and \
+				not isinstance(period, PeriodArray):
+			factor = self.compound(period)
+		else:
+			period = period_array(period, unit)
+			factor = self.compound_many(period)
+		rate = compounding.implied(factor, target._timefreq(period))
+		if np.ndim(rate) == 0:
+			rate = float(rate)
+		return InterestRate(rate, frequency, compounding, daycount, calendar,
+			self._cache)
+	
+	def __str__(self):
+		tokens = [self.frequency.name, self.compounding.name, self.daycount.name]
+		if self.calendar is not None:
+			tokens.append('cal%s' % getattr(self.calendar, 'name', self.calendar))
+		if np.ndim(self.rate) == 0:
+			tokens.insert(0, repr(self.rate))
+		return ' '.join(tokens)
+
+
+STUBS = ('short-front', 'short-back', 'long-front', 'long-back')
+
+def schedule(start, end, frequency, calendar=None, rule='following', 
+		stub='short-front'):
+	"""
+	Return the schedule of dates from start to end, both included, stepping 
+	by frequency (a Frequency or its name), as a read-only datetime64[D] 
+	array. The dates are adjusted by rule (see CalendarIndex.adjust) on 
+	calendar (a calendar or a calendar name), which defaults to weekends only.
+	
+	When the period is not a whole number of steps there is a stub:
+	'short-front' and 'long-front' roll the dates backwards from end, the 
+	stub being the first period, while 'short-back' and 'long-back' roll
+	them forwards from start, the stub being the last one. Long stubs are
+	merged with the adjacent period.
+	
+	Schedules are cached in schedule_cache, keyed by all the arguments.
+	"""
+	frequency = _as_convention(Frequency, frequency, None)
+	if isinstance(calendar, str):
+		calendar = calendars.get(calendar)
+	index = calendar_index(calendar) if calendar is not None else _weekends()
+	if index is None:
+		raise Exception('Invalid calendar: %s' % calendar)
+	start = np.datetime64(start, 'D')
+	end = np.datetime64(end, 'D')
+	key = (start, end, frequency.name, index.name, id(index), rule, stub)
+	cached = schedule_cache.get(key)
+	if cached is not None and cached[0] is index:
+		return cached[1]
+	if stub not in STUBS:
+		raise Exception('Invalid stub: %s' % stub)
+	if start >= end:
+		raise Exception('Invalid schedule: start must be before end.')
+	step = _FREQUENCY_MONTHS.get(frequency.name)
+	if step is None:
+		raise Exception('Invalid schedule frequency: %s' % frequency.name)
+	months = int((end.astype('datetime64[M]') - start.astype('datetime64[M]')).astype(np.int64))
+	k = np.arange(months//step + 2)
+	if stub.endswith('front'):
+		dates = _add_months(end, -k*step)[::-1]
+		dates = dates[dates > start]
+		if stub == 'long-front' and len(dates) > 1 and \
+				_add_months(dates[0], -step) != start:
+			dates = dates[1:]
+		dates = np.concatenate(([start], dates))
+	else:
+		dates = _add_months(start, k*step)
+		dates = dates[dates < end]
+		if stub == 'long-back' and len(dates) > 1 and \
+				_add_months(dates[-1], step) != end:
+			dates = dates[:-1]
+		dates = np.concatenate((dates, [end]))
+	dates = index.adjust(dates, rule)
+	dates.flags.writeable = False
+	schedule_cache.set(key, (index, dates))
+	return dates
+
+
+class RateBook(object):
+	"""
+	RateBook class
+	
+	Column-wise storage for a book of interest rates: a float64 array of rates
+	and small integer codes for frequency, compounding and daycount, which
+	index Frequency.names, Compounding.names and DayCount.names, and for the
+	calendar, which index the book's calendars tuple (-1 meaning none).
+	
+		book = RateBook.from_specs(['0.1 annual compounded business/252 calANBIMA',
+			'0.05 annual simple actual/360'])
+		book.discount(period_array((starts, ends)))
+	
+	compound and discount group the rows by convention, so each group is 
+	computed with a single vectorized InterestRate.compound_many call.
+	"""
+	__slots__ = ('_rates', '_frequency', '_compounding', '_daycount', '_calendar',
+		'_calendars', '_groups')
+	
+	def __init__(self, rates, frequency, compounding, daycount, calendar=None,
+			calendars=()):
+		self._rates = np.asarray(rates, dtype=np.float64)
+		n = len(self._rates)
+		self._frequency = np.asarray(frequency, dtype=np.uint8)
+		self._compounding = np.asarray(compounding, dtype=np.uint8)
+		self._daycount = np.asarray(daycount, dtype=np.uint8)
+		if calendar is None:
+			calendar = np.full(n, -1, dtype=np.int16)
+		self._calendar = np.asarray(calendar, dtype=np.int16)
+		self._calendars = tuple(calendars)
+		for codes in (self._frequency, self._compounding, self._daycount, 
+				self._calendar):
+			if codes.shape != (n,):
+				raise Exception('Invalid rate book: all columns must have %d rows' % n)
+		self._groups = None
+	
+	@classmethod
+	def from_rates(cls, rates):
+		"""Return a RateBook holding a sequence of InterestRate objects."""
+		calendars = []
+		cal_codes = []
+		for r in rates:
+			if r.calendar is None:
+				cal_codes.append(-1)
+				continue
+			for i, cal in enumerate(calendars):
+				if cal is r.calendar or cal == r.calendar:
+					cal_codes.append(i)
+					break
+			else:
+				calendars.append(r.calendar)
+				cal_codes.append(len(calendars) - 1)
+		return cls([r.rate for r in rates],
+			[Frequency.names.index(r.frequency.name) for r in rates],
+			[Compounding.names.index(r.compounding.name) for r in rates],
+			[DayCount.names.index(r.daycount.name) for r in rates],
+			cal_codes, calendars)
+	
+	@classmethod
+	def from_specs(cls, specs):
+		"""Return a RateBook for a sequence of ir() specifications."""
+		return cls.from_rates([ir(spec) for spec in specs])
+	
+	def __len__(self):
+		return len(self._rates)
+	
+	def __getitem__(self, i):
+		"""Return the i-th row as an InterestRate."""
+		cal = self._calendar[i]
+		return InterestRate(float(self._rates[i]), 
+			Frequency(Frequency.names[self._frequency[i]]),
+			Compounding(Compounding.names[self._compounding[i]]),
+			DayCount(DayCount.names[self._daycount[i]]),
+			self._calendars[cal] if cal >= 0 else None)
+	
+	def take(self, rows):
+		"""Return a RateBook holding the given rows (indices or a mask)."""
+		return RateBook(self._rates[rows], self._frequency[rows], 
+			self._compounding[rows], self._daycount[rows], self._calendar[rows],
+			self._calendars)
+	
+	def __get_rates(self):
+		return self._rates
+	rates = property(__get_rates)
+	
+	def __get_calendars(self):
+		return self._calendars
+	calendars = property(__get_calendars)
+	
+	def groups(self):
+		"""
+		Return a list of (InterestRate, rows) pairs, one for each convention
+		in the book: the InterestRate holds the rates of the rows as an array.
+		"""
+		if self._groups is None:
+			ncal = len(self._calendars) + 1
+			key = ((self._frequency.astype(np.int64)*len(Compounding.names) + 
+				self._compounding)*len(DayCount.names) + self._daycount)*ncal + \
+				self._calendar + 1
+			order = np.argsort(key, kind='mergesort')
+			_, starts = np.unique(key[order], return_index=True)
+			bounds = list(starts) + [len(key)]
+			groups = []
+			for start, end in zip(bounds[:-1], bounds[1:]):
+				rows = order[start:end]
+				proto = self[rows[0]]
+				groups.append((InterestRate(self._rates[rows], proto.frequency,
+					proto.compounding, proto.daycount, proto.calendar), rows))
+			self._groups = groups
+		return self._groups
+	
+	def compound(self, periods, unit='day'):
+		"""
+		Return the compounding factors of every rate in the book. periods is
+		either a single period, applied to every row, or anything accepted by
+		period_array with one period per row.
+		"""
+		factors = np.empty(len(self), dtype=np.float64)
+		if isinstance(periods, GenericPeriod) and \
+				not isinstance(periods, PeriodArray):
+			for rate, rows in self.groups():
+				factors[rows] = rate.compound(periods)
+			return factors
+		periods = period_array(periods, unit)
+		if len(periods) != len(self):
+			raise Exception('Invalid periods: %d periods for %d rates' % \
+				(len(periods), len(self)))
+		for rate, rows in self.groups():
+			factors[rows] = rate.compound_many(periods[rows])
+		return factors
+	
+	def discount(self, periods, unit='day'):
+		"""Return the discount factors of every rate in the book."""
+		return 1.0/self.compound(periods, unit)
+
+
+class YieldCurve(object):
+	"""
+	YieldCurve class
+	
+	A term structure built from (date, rate) knots, the rates following the
+	convention of an InterestRate (its own rate is ignored):
+	
+		curve = YieldCurve('2013-05-13', dates, rates,
+			'annual compounded business/252 calANBIMA')
+		curve.discount(dates) # discount factors
+		curve.rate(dates) # zero rates
+	
+	The knots are stored as day counts from refdate (business days when the
+	convention has a calendar) and lookups locate arrays of dates with 
+	searchsorted. Interpolations:
+	
+	- flat-forward: the forward rate, in the curve's compounding, is constant
+	  between knots
+	- linear: zero rates are linearly interpolated
+	- log-linear: logarithms of discount factors are linearly interpolated
+	
+	Before the first knot the first rate holds (as a flat forward from 
+	refdate). After the last knot, the last forward rate (flat-forward and
+	log-linear) or the last zero rate (linear) holds.
+	"""
+	interpolations = ('flat-forward', 'linear', 'log-linear')
+	
+	def __init__(self, refdate, dates, rates, convention, 
+			interpolation='flat-forward'):
+		if interpolation not in self.interpolations:
+			raise Exception('Invalid interpolation: %s' % interpolation)
+		convention = _as_rate(convention)
+		self._convention = convention
+		self._interpolation = interpolation
+		self._refdate = np.datetime64(refdate, 'D')
+		self._dates = np.asarray(dates, dtype='datetime64[D]')
+		self._rates = np.asarray(rates, dtype=np.float64)
+		if self._dates.shape != self._rates.shape or self._dates.ndim != 1 or \
+				not len(self._dates):
+			raise Exception('Invalid curve: dates and rates must be non-empty \
+				arrays of the same size.')
+		days = self._days(self._dates)
+		if days[0] <= 0 or np.any(np.diff(days) <= 0):
+			raise Exception('Invalid curve: knots must be in increasing order \
+				and after the reference date.')
+		self._knot_days = np.concatenate(([0], days))
+		t = self._time(self._knot_days)
+		self._knot_t = t
+		factors = np.concatenate(([1.0], 
+			convention.compounding.many(self._rates, t[1:])))
+		self._log_factors = np.log(factors)
+		self._factors = factors
+		self._forwards = convention.compounding.implied(factors[1:]/factors[:-1],
+			np.diff(t))
+	
+	def _days(self, dates):
+		"""Return the day counts from refdate up to dates."""
+		cal = self._convention.calendar
+		if cal is not None:
+			index = calendar_index(cal)
+			if index is not None:
+				return index.bizdays_many(self._refdate, dates)
+			return CalendarRangePeriodArray(DateRangePeriodArray(
+				(np.repeat(self._refdate, len(dates)), dates)), cal).size()
+		ordinals = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+		return ordinals - self._refdate.astype(np.int64)
+	
+	def _time(self, days):
+		"""Return the times, in the convention's frequency, of day counts."""
+		return self._convention.daycount.timefreq(FixedTimePeriodArray(days, 'day'),
+			self._convention.frequency)
+	
+	def __get_refdate(self):
+		return self._refdate
+	refdate = property(__get_refdate)
+	
+	def __get_dates(self):
+		return self._dates
+	dates = property(__get_dates)
+	
+	def __get_rates(self):
+		return self._rates
+	rates = property(__get_rates)
 	
+	def __get_convention(self):
+		return self._convention
+	convention = property(__get_convention)
+	
+	def __get_interpolation(self):
+		return self._interpolation
+	interpolation = property(__get_interpolation)
+	
+	def _compound(self, days):
+		t = self._time(days)
+		comp = self._convention.compounding
+		if self._interpolation == 'linear':
+			r = np.interp(days, self._knot_days[1:], self._rates)
+			return comp.many(r, t), t
+		i = np.clip(np.searchsorted(self._knot_days, days, side='right') - 1,
+			0, len(self._knot_days) - 2)
+		if self._interpolation == 'flat-forward':
+			return self._factors[i]*comp.many(self._forwards[i], t - self._knot_t[i]), t
+		w = (t - self._knot_t[i])/(self._knot_t[i + 1] - self._knot_t[i])
+		logf = self._log_factors[i] + w*(self._log_factors[i + 1] - self._log_factors[i])
+		return np.exp(logf), t
+	
+	def compound(self, dates):
+		"""Return the compounding factors from refdate up to dates."""
+		return self._compound(self._days(dates))[0]
+	
+	def discount(self, dates):
+		"""Return the discount factors from dates back to refdate."""
+		return 1.0/self.compound(dates)
+	
+	def rate(self, dates):
+		"""Return the zero rates from refdate up to dates."""
+		days = self._days(dates)
+		f, t = self._compound(days)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			r = self._convention.compounding.implied(f, t)
+		return np.where(days > 0, r, self._rates[0])
+
+
+class BondBook(object):
+	"""
+	BondBook class
+	
+	Columnar book of bullet bonds sharing a settlement date: maturities,
+	annual coupon rates, coupon frequencies and face values, one entry per
+	bond (scalars are broadcast). Zero coupon bonds have a coupon of 0. 
+	Coupons are paid at the frequency going backwards from the maturity and
+	amount to face*coupon/m for simple coupon compounding or to
+	face*((1 + coupon)**(1/m) - 1) for compounded one, m being the number of
+	coupons per year.
+	
+	The remaining cashflows of every bond are flattened into contiguous
+	arrays (see cashflows), so pricing the book is a single vectorized 
+	discount followed by a np.add.reduceat per bond.
+	
+		book = BondBook.ntnf('2013-05-13', ['2017-01-01', '2023-01-01'])
+		book.price(ir('0.1 annual compounded business/252 calANBIMA'))
+		book.price(curve)
+		book.ytm(prices, 'annual compounded business/252 calANBIMA')
+	"""
+	def __init__(self, settle, maturities, coupons=0.0, frequency='semi-annual',
+			face=100.0, coupon_compounding='simple'):
+		self._settle = np.datetime64(settle, 'D')
+		self._maturities = np.asarray(maturities, dtype='datetime64[D]')
+		n = len(self._maturities)
+		self._coupons = np.broadcast_to(np.asarray(coupons, dtype=np.float64), 
+			(n,)).copy()
+		self._face = np.broadcast_to(np.asarray(face, dtype=np.float64), (n,)).copy()
+		freqs = np.broadcast_to(np.asarray(frequency), (n,))
+		try:
+			self._step = np.array([_FREQUENCY_MONTHS[f] for f in freqs], 
+				dtype=np.int64)
+		except KeyError as e:
+			raise Exception('Invalid coupon frequency: %s' % e.args[0])
+		if np.any(self._maturities <= self._settle):
+			raise Exception('Invalid bond: maturities must be after the \
+				settlement date.')
+		per_year = 12.0/self._step
+		if coupon_compounding == 'simple':
+			self._coupon_amounts = self._face*self._coupons/per_year
+		elif coupon_compounding == 'compounded':
+			self._coupon_amounts = self._face*(np.power(1 + self._coupons, 
+				1/per_year) - 1)
+		else:
+			raise Exception('Invalid coupon compounding: %s' % coupon_compounding)
+		self._build_cashflows()
+	
+	@classmethod
+	def ltn(cls, settle, maturities):
+		"""Return a book of LTNs: zero coupon bonds with face value 1000."""
+		return cls(settle, maturities, 0.0, 'semi-annual', 1000.0)
+	
+	@classmethod
+	def ntnf(cls, settle, maturities):
+		"""
+		Return a book of NTN-Fs: face value 1000 and 10% a year coupons, 
+		paid semi-annually (48.80885 each, not truncated).
+		"""
+		return cls(settle, maturities, 0.1, 'semi-annual', 1000.0, 'compounded')
+	
+	def _build_cashflows(self):
+		mat = self._maturities
+		months = (mat.astype('datetime64[M]') - 
+			self._settle.astype('datetime64[M]')).astype(np.int64)
+		# upper bound on the number of remaining payments, zeros have one
+		counts = np.where(self._coupons != 0, months//self._step + 2, 1)
+		owner = np.repeat(np.arange(len(mat)), counts)
+		starts = np.cumsum(counts) - counts
+		k = counts[owner] - 1 - (np.arange(len(owner)) - starts[owner])
+		dates = _add_months(mat[owner], -k*self._step[owner])
+		keep = dates > self._settle
+		owner = owner[keep]
+		k = k[keep]
+		self._dates = dates[keep]
+		self._amounts = self._coupon_amounts[owner] + np.where(k == 0, 
+			self._face[owner], 0.0)
+		self._owner = owner
+		self._offsets = np.searchsorted(owner, np.arange(len(mat)))
+	
+	def __len__(self):
+		return len(self._maturities)
+	
+	def __get_settle(self):
+		return self._settle
+	settle = property(__get_settle)
+	
+	def __get_maturities(self):
+		return self._maturities
+	maturities = property(__get_maturities)
+	
+	def cashflows(self):
+		"""
+		Return the flattened cashflows as (dates, amounts, offsets) arrays,
+		the cashflows of the i-th bond starting at offsets[i].
+		"""
+		return self._dates, self._amounts, self._offsets
+	
+	def _periods(self):
+		return DateRangePeriodArray((np.repeat(self._settle, len(self._dates)), 
+			self._dates))
+	
+	def discount_factors(self, curve):
+		"""
+		Return the discount factors of the flattened cashflows, curve being a
+		YieldCurve, an InterestRate or a specification accepted by ir().
+		"""
+		if isinstance(curve, YieldCurve):
+			if curve.refdate != self._settle:
+				raise Exception('Invalid curve: its reference date must be the \
+					settlement date.')
+			return curve.discount(self._dates)
+		return _as_rate(curve).discount_many(self._periods())
+	
+	def price(self, curve):
+		"""
+		Return the prices of the bonds discounted by curve: a YieldCurve, an
+		InterestRate or a specification accepted by ir().
+		"""
+		return np.add.reduceat(self._amounts*self.discount_factors(curve), 
+			self._offsets)
+	
+	def price_from_yields(self, yields, convention):
+		"""
+		Return the prices of the bonds for yields (one per bond) under 
+		convention, an InterestRate or a specification without rate.
+		"""
+		rate = _as_rate(convention)
+		t = rate._timefreq(self._periods())
+		f = rate.compounding.many(np.asarray(yields, dtype=np.float64)[self._owner], t)
+		return np.add.reduceat(self._amounts/f, self._offsets)
+	
+	def ytm(self, prices, convention, **kwargs):
+		"""
+		Return the yields to maturity, under convention, of the bonds for
+		prices, and the convergence flags (see yield_to_maturity).
+		"""
+		rate = _as_rate(convention)
+		t = rate._timefreq(self._periods())
+		return yield_to_maturity(prices, self._amounts, t, self._offsets, 
+			rate.compounding, **kwargs)
+
+
+class AccrualIndex(object):
+	"""
+	AccrualIndex class
+	
+	A daily index, like CDI or SELIC, accrued from a series of daily fixings:
+	
+		cdi = AccrualIndex(dates, rates, 'annual compounded business/252')
+		cdi.append('2015-01-02', 0.1157)
+		cdi.factor(starts, ends) # accrued factors between dates
+	
+	Each fixing is quoted under the convention (an InterestRate or a 
+	specification without rate) and accrues from its date up to the next
+	fixing: over one business day under a business day count, fixings being
+	dated on business days, over the days of the day count in between under
+	the others (3 days of actual/360 from a friday to a monday). The last
+	fixing accrues up to the next day. A factor between two dates accrues
+	the fixings from start up to end, those overlapping them in part over
+	the days inside.
+	
+	The log factor accrued from the first fixing is stored for every day
+	from the first fixing to the day after the last one. So a factor is two
+	array lookups and the exponential of a difference, and appending fixings
+	only computes the days after the former last one (the buffers' capacity
+	doubles as they grow).
+	"""
+	def __init__(self, dates=(), rates=(), convention='annual compounded business/252'):
+		convention = _as_rate(convention)
+		self._convention = convention
+		self._business = convention.daycount.name.startswith('business')
+		one = FixedTimePeriod(1, 'day')
+		self._daytime = convention.daycount.timefreq(one, convention.frequency)
+		self._size = 0
+		self._ordinals = np.zeros(16, dtype=np.int64)
+		self._rates = np.zeros(16, dtype=np.float64)
+		self._accrued = np.zeros(16, dtype=np.float64)
+		self._ndays = 0
+		self.extend(dates, rates)
+	
+	def _reserve(self, nfixings, ndays):
+		"""Grow the buffers, doubling their capacity, to hold the sizes given."""
+		def grow(buf, size):
+			if size <= len(buf):
+				return buf
+			new = np.zeros(max(size, 2*len(buf)), dtype=buf.dtype)
+			new[:len(buf)] = buf
+			return new
+		self._ordinals = grow(self._ordinals, nfixings)
+		self._rates = grow(self._rates, nfixings)
+		self._accrued = grow(self._accrued, ndays)
+	
+	def _logfactors(self, starts, ends, rates):
+		"""
+		Return the log factors of fixings at rates accrued from the ordinals
+		starts up to ends.
+		"""
+		if self._business:
+			t = self._daytime
+		else:
+			periods = DateRangePeriodArray((_dates(starts), _dates(ends)))
+			t = self._convention.daycount.timefreq(periods, self._convention.frequency)
+		return np.log(self._convention.compounding.many(rates, t))
+	
+	def extend(self, dates, rates):
+		"""
+		Append arrays of fixings, their dates in increasing order and after
+		the last fixing.
+		"""
+		x = _ordinals(dates).ravel()
+		rates = np.asarray(rates, dtype=np.float64).ravel()
+		if x.shape != rates.shape:
+			raise Exception('Invalid fixings: dates and rates must have the same size.')
+		if not len(x):
+			return
+		n = self._size
+		if np.any(np.diff(x) <= 0) or (n and x[0] <= self._ordinals[n - 1]):
+			raise Exception('Invalid fixings: dates must be increasing and after \
+				the last fixing.')
+		first = self._ordinals[0] if n else x[0]
+		ndays = int(x[-1] - first) + 2
+		self._reserve(n + len(x), ndays)
+		self._ordinals[n:n + len(x)] = x
+		self._rates[n:n + len(x)] = rates
+		# the former last fixing accrues up to the first new one now, so the
+		# days are computed again from its date
+		k = max(n - 1, 0)
+		fixings = self._ordinals[k:n + len(x)]
+		rates = self._rates[k:n + len(x)]
+		logf = self._logfactors(fixings[:-1], fixings[1:], rates[:-1])
+		accrued = self._accrued[fixings[0] - first] + np.concatenate(([0.0],
+			np.cumsum(logf)))
+		# every day accrues the last fixing dated before it
+		days = np.arange(fixings[0] + 1, x[-1] + 2)
+		i = np.searchsorted(fixings, days) - 1
+		self._accrued[days - first] = accrued[i] + self._logfactors(fixings[i],
+			days, rates[i])
+		self._ndays = ndays
+		self._size = n + len(x)
+	
+	def append(self, date, rate):
+		"""Append the fixing of date, which must be after the last one."""
+		self.extend([date], [rate])
+	
+	def _logs(self, x):
+		"""Return the log factors accrued from the first fixing up to the ordinals x."""
+		if not self._size:
+			return np.zeros(np.shape(x), dtype=np.float64)
+		return self._accrued[np.clip(x - self._ordinals[0], 0, self._ndays - 1)]
+	
+	def factor(self, start, end):
+		"""
+		Return the factors accrued from start up to end (dates or arrays of
+		dates, broadcast), 1 when end is not after start.
+		"""
+		start, end = _ordinals(start), _ordinals(end)
+		return np.exp(self._logs(np.maximum(start, end)) - self._logs(start))
+	
+	def __len__(self):
+		return self._size
+	
+	def __get_dates(self):
+		return _dates(self._ordinals[:self._size])
+	dates = property(__get_dates)
+	
+	def __get_rates(self):
+		return self._rates[:self._size]
+	rates = property(__get_rates)
+	
+	def __get_convention(self):
+		return self._convention
+	convention = property(__get_convention)
+
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday',
+	'sunday')
+
+# business day adjustment rules and the CalendarIndex methods applying them
+ADJUSTMENT_RULES = {
+	'following': 'following',
+	'modified-following': 'modified_following',
+	'preceding': 'preceding',
+	'modified-preceding': 'modified_preceding',
+}
+
+# compiled calendar header: magic, version, weekend bit mask, first and last
+# ordinals of the index, number of holidays and of cumulative counts
+_CALC_HEADER = struct.Struct('<4sHBxiiII')
+_CALC_MAGIC = b'FCAL'
+_CALC_VERSION = 1
+
+# datetime64[D] counts days from 1970-01-01, CalendarIndex uses date ordinals
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def _ordinal(d):
+	"""Return the proleptic Gregorian ordinal of a date, ISO string or ordinal."""
+	if isinstance(d, date):
+		return d.toordinal()
+	if isinstance(d, str):
+		return datetime.strptime(d, '%Y-%m-%d').toordinal()
+	return int(d)
+
+def _ordinals(dates):
+	"""Return an int64 array of ordinals for anything NumPy converts to dates."""
+	dates = np.asarray(dates)
+	if dates.dtype.kind not in 'iu':
+		dates = dates.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+	return dates.astype(np.int64)
+
+
+def _add_months(dates, months):
+	"""
+	Return dates shifted by months (arrays or scalars, broadcast), the day of
+	the month clamped to the length of the resulting month.
+	"""
+	dates = np.asarray(dates, dtype='datetime64[D]')
+	month = dates.astype('datetime64[M]')
+	day = (dates - month.astype('datetime64[D]')).astype(np.int64)
+	month = month + np.asarray(months, dtype=np.int64).astype('timedelta64[M]')
+	first = month.astype('datetime64[D]')
+	length = ((month + 1).astype('datetime64[D]') - first).astype(np.int64)
+	return first + np.minimum(day, length - 1).astype('timedelta64[D]')
+
+def _dates(ordinals):
+	"""Return the datetime64[D] array for an array of date ordinals."""
+	return (np.asarray(ordinals, dtype=np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+class CalendarIndex(object):
+	"""
+	CalendarIndex class
+	
+	A CalendarIndex holds, for every day of the calendar's span (from the first
+	year to the last year with holidays), the cumulative count of business
+	days. Counting the business days between two dates is then two array
+	lookups and a subtraction.
+	
+	Out of the span only weekends are known, so the count is extended in O(1)
+	by counting whole weeks and a remainder, as prototyped in calendartests.py.
+	
+	As in the prototype (see the weekday fixtures, monday.csv ... sunday.csv),
+	a starting date out of business is rolled forward to the next business
+	day, and then the business days after it up to the ending date are
+	counted: Friday to Monday is 1, Saturday to Monday is 0.
+	"""
+	def __init__(self, holidays, weekend=(5, 6), name=None):
+		self._set_weekend(weekend)
+		hol = np.unique(np.array([_ordinal(d) for d in holidays], 
+			dtype=np.int64))
+		# the index starts one day before the span, so that it is anchored at a
+		# day with no holidays up to it and out of span counts stay exact
+		if len(hol):
+			lo = date.fromordinal(int(hol[0])).replace(month=1, day=1).toordinal() - 1
+			hi = date.fromordinal(int(hol[-1])).replace(month=12, day=31).toordinal()
+		else:
+			lo = hi = 1
+		days = np.arange(lo, hi + 1, dtype=np.int64)
+		isbiz = self._workday[(days + 6) % 7] & ~np.isin(days, hol)
+		cum = self._weekdays(lo - 1) + np.cumsum(isbiz)
+		self._set_index(name, hol.astype(np.int32), lo, hi, cum.astype(np.int32))
+	
+	def _set_weekend(self, weekend):
+		self._weekend = tuple(sorted(set(weekend)))
+		workday = np.ones(7, dtype=bool)
+		workday[list(self._weekend)] = False
+		self._workday = workday
+		# cumulative working weekdays within a week starting on monday
+		self._weekcum = [0] + np.cumsum(workday).tolist()
+		self._weekcum_array = np.array(self._weekcum, dtype=np.int64)
+		self._nworkdays = int(workday.sum())
+	
+	def _set_index(self, name, holidays, lo, hi, cum):
+		self._name = name
+		self._holidays = holidays
+		self._lo = lo
+		self._hi = hi
+		self._cum = cum
+		self._holidays.flags.writeable = False
+		self._cum.flags.writeable = False
+	
+	@classmethod
+	def from_file(cls, fname, name=None):
+		"""
+		Return a CalendarIndex for a .cal file: the weekend days names come
+		first followed by the holidays, one ISO date per line.
+		"""
+		weekend = []
+		holidays = []
+		with open(fname) as fcal:
+			for line in fcal:
+				line = line.strip()
+				if not line:
+					continue
+				if line.lower() in WEEKDAYS:
+					weekend.append(WEEKDAYS.index(line.lower()))
+				else:
+					holidays.append(datetime.strptime(line, '%Y-%m-%d').date())
+		if name is None:
+			name = os.path.splitext(os.path.basename(fname))[0]
+		return cls(holidays, weekend, name)
+	
+	@classmethod
+	def from_compiled(cls, fname, name=None):
+		"""
+		Return a CalendarIndex for a compiled calendar (see compile_calendar).
+		The file is memory-mapped read-only and its arrays are used in place,
+		so processes loading the same file share its pages and nothing is
+		parsed.
+		"""
+		import mmap
+		with open(fname, 'rb') as fcal:
+			buf = mmap.mmap(fcal.fileno(), 0, access=mmap.ACCESS_READ)
+		if len(buf) < _CALC_HEADER.size:
+			raise Exception('Invalid compiled calendar: %s' % fname)
+		magic, version, mask, lo, hi, nhol, ncum = _CALC_HEADER.unpack_from(buf)
+		if magic != _CALC_MAGIC or version != _CALC_VERSION or \
+				len(buf) != _CALC_HEADER.size + 4*(nhol + ncum):
+			raise Exception('Invalid compiled calendar: %s' % fname)
+		hol = np.frombuffer(buf, dtype='<i4', count=nhol, 
+			offset=_CALC_HEADER.size)
+		cum = np.frombuffer(buf, dtype='<i4', count=ncum, 
+			offset=_CALC_HEADER.size + 4*nhol)
+		if name is None:
+			name = os.path.splitext(os.path.basename(fname))[0]
+		index = cls.__new__(cls)
+		index._set_weekend(i for i in range(7) if mask & (1 << i))
+		index._set_index(name, hol, lo, hi, cum)
+		return index
+	
+	def compile(self, fname):
+		"""
+		Write the index to fname in the compiled calendar format: a header,
+		followed by the holidays and the cumulative business days as int32 
+		ordinals. The file is written aside and renamed, so readers never see
+		it half written.
+		"""
+		mask = sum(1 << i for i in self._weekend)
+		header = _CALC_HEADER.pack(_CALC_MAGIC, _CALC_VERSION, mask, self._lo, 
+			self._hi, len(self._holidays), len(self._cum))
+		tmpname = '%s.%d.tmp' % (fname, os.getpid())
+		with open(tmpname, 'wb') as fcal:
+			fcal.write(header)
+			fcal.write(self._holidays.astype('<i4').tobytes())
+			fcal.write(self._cum.astype('<i4').tobytes())
+		os.rename(tmpname, fname)
+	
+	def __get_name(self):
+		return self._name
+	name = property(__get_name)
+	
+	def __get_weekend(self):
+		return self._weekend
+	weekend = property(__get_weekend)
+	
+	def __get_holidays(self):
+		return tuple(date.fromordinal(int(d)) for d in self._holidays)
+	holidays = property(__get_holidays)
+	
+	def __get_startdate(self):
+		return date.fromordinal(self._lo + 1)
+	startdate = property(__get_startdate)
+	
+	def __get_enddate(self):
+		return date.fromordinal(self._hi)
+	enddate = property(__get_enddate)
+	
+	def __eq__(self, other):
+		return self._name is not None and \
+			self._name == getattr(other, 'name', None)
+	
+	def __ne__(self, other):
+		return not self == other
+	
+	def _weekdays(self, x):
+		"""Count of working weekdays from ordinal 1 (a monday) up to x."""
+		q, r = divmod(x, 7)
+		return q*self._nworkdays + self._weekcum[r]
+	
+	def _weekdays_many(self, x):
+		"""Vectorized version of _weekdays."""
+		q, r = np.divmod(x, 7)
+		return q*self._nworkdays + self._weekcum_array[r]
+	
+	def _count(self, x):
+		"""Count of business days from ordinal 1 up to x."""
+		c = min(max(x, self._lo), self._hi)
+		return int(self._cum[c - self._lo]) + self._weekdays(x) - self._weekdays(c)
+	
+	def _count_many(self, x):
+		"""Vectorized version of _count."""
+		c = np.clip(x, self._lo, self._hi)
+		return self._cum[c - self._lo] + self._weekdays_many(x) - \
+			self._weekdays_many(c)
+	
+	def bizdays(self, dates):
+		"""
+		Return the amount of business days between two dates. dates is a tuple
+		of date objects or ISO strings, as in Calendar.bizdays.
+		"""
+		n = self._count(_ordinal(dates[1])) - self._count(_ordinal(dates[0]) - 1)
+		return max(n - 1, 0)
+	
+	def bizdays_many(self, starts, ends):
+		"""
+		Vectorized version of bizdays: starts and ends are arrays of anything
+		NumPy converts to dates (or date ordinals).
+		"""
+		n = self._count_many(_ordinals(ends)) - self._count_many(_ordinals(starts) - 1)
+		return np.maximum(n - 1, 0)
+	
+	def _unweekdays(self, w):
+		"""Return the first ordinal x with _weekdays(x) >= w (vectorized)."""
+		q = (w - 1)//self._nworkdays
+		r = np.searchsorted(self._weekcum_array, w - q*self._nworkdays)
+		return 7*q + r
+	
+	def _bizday(self, pos):
+		"""
+		Return the ordinals of the business days at the positions pos, the
+		inverse of _count_many: the first ordinal x with _count(x) >= pos.
+		"""
+		pos = np.asarray(pos, dtype=np.int64)
+		c_lo = int(self._cum[0])
+		c_hi = int(self._cum[-1])
+		inside = self._lo + np.searchsorted(self._cum, np.clip(pos, c_lo, c_hi))
+		below = self._unweekdays(self._weekdays(self._lo) - c_lo + pos)
+		above = self._unweekdays(self._weekdays(self._hi) - c_hi + pos)
+		return np.where(pos <= c_lo, below, np.where(pos > c_hi, above, inside))
+	
+	def isbizday(self, dates):
+		"""Return a boolean array telling which dates are business days."""
+		x = _ordinals(dates)
+		return self._count_many(x) - self._count_many(x - 1) == 1
+	
+	def offset(self, dates, n):
+		"""
+		Return dates shifted by n business days (arrays or scalars, broadcast),
+		so that bizdays((d, offset(d, n))) == n: forwards (n > 0) a date out
+		of business is first rolled forward, backwards (n < 0) it is first
+		rolled back, and offset(d, 0) is the following business day.
+		"""
+		x = _ordinals(dates)
+		n = np.asarray(n, dtype=np.int64)
+		pos = np.where(n >= 0, self._count_many(x - 1) + 1 + n, 
+			self._count_many(x) + n)
+		return _dates(self._bizday(pos))
+	
+	def following(self, dates):
+		"""Return the first business days on or after dates."""
+		return _dates(self._bizday(self._count_many(_ordinals(dates) - 1) + 1))
+	
+	def preceding(self, dates):
+		"""Return the last business days on or before dates."""
+		return _dates(self._bizday(self._count_many(_ordinals(dates))))
+	
+	def modified_following(self, dates):
+		"""
+		Return the following business days, unless they fall in the next
+		month, in which case the preceding ones are returned.
+		"""
+		dates = np.asarray(dates, dtype='datetime64[D]')
+		following = self.following(dates)
+		same_month = following.astype('datetime64[M]') == dates.astype('datetime64[M]')
+		return np.where(same_month, following, self.preceding(dates))
+	
+	def modified_preceding(self, dates):
+		"""
+		Return the preceding business days, unless they fall in the previous
+		month, in which case the following ones are returned.
+		"""
+		dates = np.asarray(dates, dtype='datetime64[D]')
+		preceding = self.preceding(dates)
+		same_month = preceding.astype('datetime64[M]') == dates.astype('datetime64[M]')
+		return np.where(same_month, preceding, self.following(dates))
+	
+	def adjust(self, dates, rule='following'):
+		"""
+		Return dates adjusted to business days by rule: 'following', 
+		'modified-following', 'preceding', 'modified-preceding' or 
+		'unadjusted'.
+		"""
+		if rule == 'unadjusted':
+			return np.asarray(dates, dtype='datetime64[D]')
+		try:
+			adjust = getattr(self, ADJUSTMENT_RULES[rule])
+		except KeyError:
+			raise Exception('Invalid adjustment rule: %s' % rule)
+		return adjust(dates)
+
+
+class CalendarRegistry(object):
+	"""
+	CalendarRegistry class
+	
+	Process-wide cache of calendars keyed by name. A calendar is loaded from
+	its .cal file on first use and the same immutable CalendarIndex instance
+	is returned afterwards, until the modification time of the file, or of
+	its compiled version, changes and it is reloaded. The files are looked up
+	again at most once every interval seconds for each calendar (0 checks
+	them on every call), so the calls in between cost a dictionary lookup. Files are searched in the directories
+	listed in path. A compiled calendar (NAME.calc, see compile_calendar) is
+	preferred when it is present and newer than NAME.cal.
+	
+		calendars.preload('ANBIMA')
+		cal = calendars.get('ANBIMA')
+		calendars.stats() # {'hits': 1, 'misses': 1, ...}
+	"""
+	def __init__(self, path=None, interval=1.0):
+		if path is None:
+			path = (os.curdir, os.path.dirname(os.path.abspath(__file__)))
+		self.path = tuple(path)
+		self.interval = interval
+		self._clock = getattr(time, 'monotonic', time.time)
+		# name -> [file name, modification times of the file and of the
+		# compiled one (None without it), CalendarIndex, checked at]
+		self._calendars = {}
+		# name -> time of the last lookup which found no file
+		self._missing = {}
+		self.hits = 0
+		self.misses = 0
+		self.reloads = 0
+	
+	def find(self, name):
+		"""Return the .cal file for the calendar name or None if not found."""
+		for dirname in self.path:
+			fname = os.path.join(dirname, '%s.cal' % name)
+			if os.path.exists(fname):
+				return fname
+		return None
+	
+	def get(self, name):
+		"""Return the CalendarIndex for the calendar name."""
+		entry = self._calendars.get(name)
+		if entry is not None and self._clock() - entry[3] < self.interval:
+			self.hits += 1
+			return entry[2]
+		cal = self.lookup(name)
+		if cal is None:
+			raise Exception('Invalid calendar: %s.cal not found' % name)
+		return cal
+	
+	def lookup(self, name):
+		"""
+		Return the CalendarIndex for the calendar name, or None when it has no
+		file. A missing file is also looked up again at most once every
+		interval seconds.
+		"""
+		entry = self._calendars.get(name)
+		now = self._clock()
+		if entry is not None and now - entry[3] < self.interval:
+			self.hits += 1
+			return entry[2]
+		missing = self._missing.get(name)
+		if missing is not None and now - missing < self.interval:
+			return None
+		fname = self.find(name)
+		if fname is None:
+			self._missing[name] = now
+			return None
+		self._missing.pop(name, None)
+		mtimes = (os.path.getmtime(fname), self._compiled_mtime(fname))
+		if entry is not None and entry[0] == fname and entry[1] == mtimes:
+			entry[3] = now
+			self.hits += 1
+			return entry[2]
+		self.misses += 1
+		if entry is not None:
+			self.reloads += 1
+		cal = self._load(fname, name, mtimes)
+		self._calendars[name] = [fname, mtimes, cal, now]
+		return cal
+	
+	def _compiled_mtime(self, fname):
+		"""Return the modification time of the compiled fname, None if absent."""
+		try:
+			return os.path.getmtime(fname + 'c')
+		except OSError:
+			return None
+	
+	def _load(self, fname, name, mtimes):
+		mtime, compiled = mtimes
+		if compiled is not None and compiled >= mtime:
+			return CalendarIndex.from_compiled(fname + 'c', name)
+		return CalendarIndex.from_file(fname, name)
+	
+	def preload(self, *names):
+		"""Load the given calendars ahead of their first use."""
+		for name in names:
+			self.get(name)
+	
+	def clear(self):
+		"""Drop every loaded calendar and reset the counters."""
+		self._calendars.clear()
+		self._missing.clear()
+		self.hits = self.misses = self.reloads = 0
+	
+	def names(self):
+		"""Return the names of the loaded calendars."""
+		return tuple(sorted(self._calendars.keys()))
+	
+	def __len__(self):
+		return len(self._calendars)
+	
+	def __contains__(self, name):
+		return name in self._calendars
+	
+	def stats(self):
+		"""Return hit/miss counts and the loaded calendars."""
+		return {'hits': self.hits, 'misses': self.misses, 
+			'reloads': self.reloads, 'calendars': self.names()}
+
+calendars = CalendarRegistry()
+
+# default calendar of schedules: saturdays and sundays only, built on first
+# use (see _weekends)
+_WEEKENDS = None
+
+def _weekends():
+	global _WEEKENDS
+	if _WEEKENDS is None:
+		_WEEKENDS = CalendarIndex([], name='weekends')
+	return _WEEKENDS
+
+def prewarm(*names):
+	"""
+	Load the calendars names and build the tables of the module ahead of
+	their first use, which are otherwise deferred to keep the import fast:
+	
+		prewarm('ANBIMA')
+	"""
+	calendars.preload(*names)
+	_year_starts()
+	_weekends()
+	_fields_360_table()
+	_leapdays_table()
+	_RATE_RE.match
+	_PERIOD_RE.match
+
+def compile_calendar(fname, output=None):
+	"""
+	Compile the .cal file fname into the binary format loaded by
+	CalendarIndex.from_compiled and return the compiled file name, which
+	defaults to fname + 'c' (ANBIMA.cal -> ANBIMA.calc), the file the 
+	calendars registry looks for.
+	"""
+	if output is None:
+		output = fname + 'c'
+	CalendarIndex.from_file(fname).compile(output)
+	return output
+
+def calendar_index(calendar):
+	"""
+	Return the CalendarIndex for calendar. A CalendarIndex is returned as it
+	is; other calendar objects (like bizdays' Calendar) are resolved by name
+	through the calendars registry, so they share its instances. None is 
+	returned when no .cal file exists for that name.
+	"""
+	if isinstance(calendar, CalendarIndex):
+		return calendar
+	name = getattr(calendar, 'name', None)
+	if name is None:
+		return None
+	return calendars.lookup(name)
+
+
+class LRUCache(object):
+	"""
+	LRUCache class
+	
+	A mapping bounded to maxsize entries which evicts the least recently used
+	one and counts hits and misses. A maxsize of 0 disables the cache.
+	"""
+	def __init__(self, maxsize=1024):
+		self._data = OrderedDict()
+		self._maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+	
+	def __get_maxsize(self):
+		return self._maxsize
+	maxsize = property(__get_maxsize)
+	
+	def __get_hitrate(self):
+		lookups = self.hits + self.misses
+		return self.hits/float(lookups) if lookups else 0.0
+	hitrate = property(__get_hitrate)
+	
+	def get(self, key, default=None):
+		"""Return the value cached for key, counting a hit or a miss."""
+		try:
+			value = self._data.pop(key)
+		except KeyError:
+			self.misses += 1
+			return default
+		self._data[key] = value
+		self.hits += 1
+		return value
+	
+	def set(self, key, value):
+		"""Cache value for key, evicting the least recently used entries."""
+		self._data.pop(key, None)
+		self._data[key] = value
+		while len(self._data) > self._maxsize:
+			self._data.popitem(last=False)
+	
+	def resize(self, maxsize):
+		"""Change the bound of the cache, evicting entries if needed."""
+		self._maxsize = maxsize
+		while len(self._data) > self._maxsize:
+			self._data.popitem(last=False)
+	
+	def clear(self):
+		"""Drop every entry and reset the counters."""
+		self._data.clear()
+		self.hits = self.misses = 0
+	
+	def __len__(self):
+		return len(self._data)
+	
+	def __contains__(self, key):
+		return key in self._data
+	
+	def stats(self):
+		"""Return hit/miss counts and the cache size."""
+		return {'hits': self.hits, 'misses': self.misses, 
+			'size': len(self._data), 'maxsize': self._maxsize}
+
+class TTLCache(LRUCache):
+	"""
+	TTLCache class
+	
+	An LRUCache whose entries also expire ttl seconds after they are set
+	(never when ttl is None). Expired entries are dropped when they are
+	looked up, counting a miss, and in set, from the least recently used
+	end. Entries can be dropped by key or by predicate (see invalidate).
+	"""
+	def __init__(self, maxsize=1024, ttl=None, clock=None):
+		super(TTLCache, self).__init__(maxsize)
+		self._ttl = ttl
+		self._clock = clock if clock is not None else \
+			getattr(time, 'monotonic', time.time)
+		self.expirations = 0
+		self.invalidations = 0
+	
+	def __get_ttl(self):
+		return self._ttl
+	ttl = property(__get_ttl)
+	
+	def set_ttl(self, ttl):
+		"""Change the time to live of the entries set from now on."""
+		self._ttl = ttl
+	
+	def get(self, key, default=None):
+		"""Return the value cached for key, counting a hit or a miss."""
+		try:
+			value, expires = self._data.pop(key)
+		except KeyError:
+			self.misses += 1
+			return default
+		if expires is not None and self._clock() >= expires:
+			self.expirations += 1
+			self.misses += 1
+			return default
+		self._data[key] = (value, expires)
+		self.hits += 1
+		return value
+	
+	def set(self, key, value):
+		"""
+		Cache value for key, evicting expired entries from the least
+		recently used end and then the least recently used ones.
+		"""
+		now = self._clock()
+		self._data.pop(key, None)
+		self._data[key] = (value, now + self._ttl if self._ttl is not None else None)
+		while self._data:
+			oldest = next(iter(self._data))
+			expires = self._data[oldest][1]
+			if expires is None or expires > now:
+				break
+			del self._data[oldest]
+			self.expirations += 1
+		while len(self._data) > self._maxsize:
+			self._data.popitem(last=False)
+	
+	def discard(self, key):
+		"""Drop the entry of key, if any, counting an invalidation."""
+		if self._data.pop(key, None) is not None:
+			self.invalidations += 1
+	
+	def invalidate(self, predicate):
+		"""
+		Drop the entries for which predicate(key, value) is true and return
+		how many were dropped.
+		"""
+		keys = [k for k, (v, expires) in self._data.items() if predicate(k, v)]
+		for k in keys:
+			del self._data[k]
+		self.invalidations += len(keys)
+		return len(keys)
+	
+	def clear(self):
+		"""Drop every entry and reset the counters."""
+		super(TTLCache, self).clear()
+		self.expirations = self.invalidations = 0
+	
+	def stats(self):
+		"""Return hit/miss, expiration and invalidation counts and sizes."""
+		stats = super(TTLCache, self).stats()
+		stats.update({'expirations': self.expirations, 
+			'invalidations': self.invalidations, 'ttl': self._ttl})
+		return stats
+
+# ir and period caches: whole specifications and convention templates
+ir_cache = LRUCache(4096)
+ir_templates = LRUCache(1024)
+period_cache = LRUCache(4096)
+# generated schedules (see schedule)
+schedule_cache = LRUCache(4096)
+# times of date range periods (see InterestRate), disabled by default
+timefreq_cache = LRUCache(0)
+# compounding factors of date range periods (see InterestRate), disabled by
+# default
+factor_cache = TTLCache(0, ttl=60.0)
+
+def invalidate_calendar(name):
+	"""
+	Drop the factors cached in factor_cache for rates or periods on the
+	calendar name and return how many were dropped. Reloaded calendars are
+	detected by factor_cache itself, this is for calendars changed in place.
+	"""
+	return factor_cache.invalidate(lambda key, value: key[3] == name)
+
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+def _timed(func, counters):
+	"""Return func wrapped to add its calls and elapsed time to counters."""
+	def timed(*args, **kwargs):
+		start = _clock()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			counters[0] += 1
+			counters[1] += _clock() - start
+	timed.__name__ = func.__name__
+	timed.__doc__ = func.__doc__
+	timed.__wrapped__ = func
+	return timed
+
+class Instrumentation(object):
+	"""
+	Instrumentation class
+
+	Opt-in call counters and cumulative timers of the hot paths (ir, period,
+	CalendarRangePeriod.size, DayCount.timefreq and Compounding.__call__)
+	along with the hit/miss counts of the caches. Enabling swaps timed
+	wrappers in for those functions and disabling puts the originals back,
+	so a disabled instrumentation costs nothing. Calls through references
+	taken before enabling (like from fixedincome import ir) are not counted.
+
+		instrumentation.enable()
+		...
+		instrumentation.snapshot() # {'functions': {'ir': {'calls': 1, ...
+		print(instrumentation.prometheus())
+		instrumentation.disable()
+	"""
+	def __init__(self, targets, caches):
+		self._targets = targets
+		self._caches = caches
+		self._counters = dict((name, [0, 0.0]) for owner, attr, name in targets)
+		self._originals = None
+		self._depth = 0
+
+	def __get_enabled(self):
+		return self._depth > 0
+	enabled = property(__get_enabled)
+
+	def enable(self):
+		"""
+		Swap the timed wrappers in. Calls nest: the originals come back with
+		the last matching disable.
+		"""
+		self._depth += 1
+		if self._depth > 1:
+			return
+		self._originals = []
+		for owner, attr, name in self._targets:
+			namespace = owner if isinstance(owner, dict) else owner.__dict__
+			func = namespace[attr]
+			self._originals.append(func)
+			self._set(owner, attr, _timed(func, self._counters[name]))
+
+	def disable(self):
+		"""Put the original functions back (see enable)."""
+		if self._depth == 0:
+			return
+		self._depth -= 1
+		if self._depth > 0:
+			return
+		for (owner, attr, name), func in zip(self._targets, self._originals):
+			self._set(owner, attr, func)
+		self._originals = None
+
+	def _set(self, owner, attr, func):
+		if isinstance(owner, dict):
+			owner[attr] = func
+		else:
+			setattr(owner, attr, func)
+
+	def reset(self):
+		"""Zero the call counters and timers."""
+		for counters in self._counters.values():
+			counters[0] = 0
+			counters[1] = 0.0
+
+	def snapshot(self):
+		"""
+		Return the counters as a dict: calls and seconds by function and
+		hits, misses and entries by cache.
+		"""
+		functions = dict((name, {'calls': c[0], 'seconds': c[1]})
+			for name, c in self._counters.items())
+		caches = dict((name, {'hits': cache.hits, 'misses': cache.misses,
+			'entries': len(cache)}) for name, cache in self._caches.items())
+		return {'functions': functions, 'caches': caches}
+
+	def prometheus(self):
+		"""Return the counters in the Prometheus text exposition format."""
+		return _prometheus(self.snapshot())
+
+	def profile(self):
+		"""Return a Profile context manager (see profile)."""
+		return Profile(self)
+
+class Profile(object):
+	"""
+	Profile class
+
+	Context manager enabling the instrumentation for a block of code and
+	keeping the counters accumulated inside it.
+
+		with profile() as prof:
+			...
+		prof.snapshot()
+		print(prof.prometheus())
+	"""
+	def __init__(self, instrumentation):
+		self._instrumentation = instrumentation
+		self._start = None
+		self._result = None
+
+	def __enter__(self):
+		self._instrumentation.enable()
+		self._start = self._instrumentation.snapshot()
+		return self
+
+	def __exit__(self, *exc):
+		end = self._instrumentation.snapshot()
+		self._instrumentation.disable()
+		self._result = _delta(end, self._start)
+		return False
+
+	def snapshot(self):
+		"""Return the counters of the block, as Instrumentation.snapshot."""
+		if self._result is None:
+			return _delta(self._instrumentation.snapshot(), self._start)
+		return self._result
+
+	def prometheus(self):
+		"""Return the counters of the block in the Prometheus text format."""
+		return _prometheus(self.snapshot())
+
+def _delta(end, start):
+	"""Return the counters of snapshot end accumulated since start."""
+	result = {}
+	for group in ('functions', 'caches'):
+		result[group] = {}
+		for name, values in end[group].items():
+			result[group][name] = dict((k, v if k == 'entries' else
+				v - start[group][name][k]) for k, v in values.items())
+	return result
+
+_PROMETHEUS_METRICS = [
+	('functions', 'calls', 'fixedincome_calls_total', 'counter', 'function',
+		'Calls of the instrumented functions.'),
+	('functions', 'seconds', 'fixedincome_seconds_total', 'counter', 'function',
+		'Time spent in the instrumented functions, in seconds.'),
+	('caches', 'hits', 'fixedincome_cache_hits_total', 'counter', 'cache',
+		'Cache hits.'),
+	('caches', 'misses', 'fixedincome_cache_misses_total', 'counter', 'cache',
+		'Cache misses.'),
+	('caches', 'entries', 'fixedincome_cache_entries', 'gauge', 'cache',
+		'Entries held by the caches.'),
+]
+
+def _prometheus(snapshot):
+	"""Return a snapshot in the Prometheus text exposition format."""
+	lines = []
+	for group, key, metric, kind, label, text in _PROMETHEUS_METRICS:
+		lines.append('# HELP %s %s' % (metric, text))
+		lines.append('# TYPE %s %s' % (metric, kind))
+		for name, values in sorted(snapshot[group].items()):
+			lines.append('%s{%s="%s"} %r' % (metric, label, name, values[key]))
+	return '\n'.join(lines) + '\n'
+
+instrumentation = Instrumentation([
+		(globals(), 'ir', 'ir'),
+		(globals(), 'period', 'period'),
+		(CalendarRangePeriod, 'size', 'CalendarRangePeriod.size'),
+		(DayCount, 'timefreq', 'DayCount.timefreq'),
+		(Compounding, '__call__', 'Compounding.__call__'),
+	], {'ir_cache': ir_cache, 'ir_templates': ir_templates,
+		'period_cache': period_cache, 'schedule_cache': schedule_cache,
+		'timefreq_cache': timefreq_cache, 'factor_cache': factor_cache,
+		'calendars': calendars})
+
+def profile():
+	"""
+	Return a context manager capturing the instrumentation counters of a
+	block of code (see Profile and Instrumentation).
+	"""
+	return instrumentation.profile()
+
+
+def present_value(amounts, starts, ends, discount, workers=1, shardsize=262144):
+	"""
+	Return the present values of cashflows, and their total: amounts paid at
+	ends discounted to starts by the rates of a RateBook (one row per 
+	cashflow) or, when discount is a YieldCurve, to the curve's reference
+	date (starts are then ignored).
+	
+		values, total = present_value(amounts, starts, ends, book, workers=4)
+	
+	The rows are valued in shards of shardsize rows, by a pool of workers
+	processes (concurrent.futures) when workers > 1. The columns and the
+	curve's knots are saved once to memory-mapped files, and the calendars
+	compiled (see CalendarIndex.compile), which the workers attach to; they
+	write the values in place, so tasks only carry shard bounds. The total
+	is summed by shard, in shard order, so the results do not depend on the
+	number of workers.
+	"""
+	amounts = np.asarray(amounts, dtype=np.float64)
+	n = len(amounts)
+	columns = {'amounts': amounts, 
+		'starts': np.broadcast_to(np.asarray(starts, dtype='datetime64[D]'), (n,)),
+		'ends': np.asarray(ends, dtype='datetime64[D]')}
+	if isinstance(discount, YieldCurve):
+		conv = discount.convention
+		meta = {'kind': 'curve', 'refdate': str(discount.refdate), 
+			'convention': (conv.frequency.name, conv.compounding.name, 
+			conv.daycount.name), 'interpolation': discount.interpolation}
+		cals = (conv.calendar,) if conv.calendar is not None else ()
+		columns['curve_dates'] = discount.dates
+		columns['curve_rates'] = discount.rates
+	elif isinstance(discount, RateBook):
+		meta = {'kind': 'book'}
+		cals = discount.calendars
+		columns.update(rates=discount._rates, frequency=discount._frequency,
+			compounding=discount._compounding, daycount=discount._daycount,
+			calendar=discount._calendar)
+	else:
+		raise Exception('Invalid discount: a RateBook or a YieldCurve is expected')
+	indexes = [calendar_index(cal) for cal in cals]
+	if None in indexes:
+		raise Exception('Invalid calendar: present_value requires .cal files')
+	meta['calendars'] = [index.name for index in indexes]
+	bounds = [(lo, min(lo + shardsize, n)) for lo in range(0, n, shardsize)]
+	if workers is None or workers <= 1:
+		market = _market(meta, columns, indexes)
+		values = np.empty(n, dtype=np.float64)
+		totals = []
+		for lo, hi in bounds:
+			values[lo:hi] = _value_rows(market, columns, lo, hi)
+			totals.append(values[lo:hi].sum())
+		return values, _sum(totals)
+	import shutil
+	import tempfile
+	from concurrent.futures import ProcessPoolExecutor
+	store = tempfile.mkdtemp(prefix='fixedincome-')
+	try:
+		for name, column in columns.items():
+			np.save(os.path.join(store, name + '.npy'), column)
+		for i, index in enumerate(indexes):
+			index.compile(os.path.join(store, 'calendar%d.calc' % i))
+		values = np.lib.format.open_memmap(os.path.join(store, 'values.npy'),
+			mode='w+', dtype=np.float64, shape=(n,))
+		with ProcessPoolExecutor(workers) as executor:
+			totals = list(executor.map(_value_shard, 
+				[(store, meta, lo, hi) for lo, hi in bounds]))
+		result = np.array(values)
+		del values
+	finally:
+		shutil.rmtree(store, ignore_errors=True)
+	return result, _sum(totals)
+
+def _sum(totals):
+	"""Sum the shard totals in order."""
+	total = 0.0
+	for t in totals:
+		total += t
+	return float(total)
+
+def _market(meta, columns, indexes):
+	"""Return the RateBook or YieldCurve described by meta and columns."""
+	if meta['kind'] == 'curve':
+		frequency, compounding, daycount = meta['convention']
+		conv = InterestRate(0.0, Frequency(frequency), Compounding(compounding),
+			DayCount(daycount), indexes[0] if indexes else None)
+		return YieldCurve(meta['refdate'], columns['curve_dates'], 
+			columns['curve_rates'], conv, meta['interpolation'])
+	return RateBook(columns['rates'], columns['frequency'], 
+		columns['compounding'], columns['daycount'], columns['calendar'],
+		indexes)
+
+def _value_rows(market, columns, lo, hi):
+	"""Return the present values of the rows lo to hi."""
+	ends = columns['ends'][lo:hi]
+	if isinstance(market, YieldCurve):
+		factors = market.discount(ends)
+	else:
+		factors = market.take(slice(lo, hi)).discount(
+			DateRangePeriodArray((columns['starts'][lo:hi], ends)))
+	return columns['amounts'][lo:hi]*factors
+
+# markets attached by the present_value workers, by store
+_attached = {}
+
+def _value_shard(task):
+	"""
+	present_value worker: value the rows lo to hi of the store, writing
+	them to its values file, and return their total.
+	"""
+	store, meta, lo, hi = task
+	if store not in _attached:
+		_attached.clear()
+		columns = {}
+		for fname in os.listdir(store):
+			if fname.endswith('.npy') and fname != 'values.npy':
+				columns[fname[:-4]] = np.load(os.path.join(store, fname), 
+					mmap_mode='r')
+		indexes = [CalendarIndex.from_compiled(
+			os.path.join(store, 'calendar%d.calc' % i), name) 
+			for i, name in enumerate(meta['calendars'])]
+		values = np.load(os.path.join(store, 'values.npy'), mmap_mode='r+')
+		_attached[store] = (_market(meta, columns, indexes), columns, values)
+	market, columns, values = _attached[store]
+	values[lo:hi] = _value_rows(market, columns, lo, hi)
+	return values[lo:hi].sum()
+
+def compound_csv(source, target, chunksize=100000, header=True, rate_column=0,
+		period_column=1, report=None):
+	"""
+	Stream the rows of the CSV file object source, holding interest rate and
+	period specifications (see ir and period), to the CSV file object target,
+	each row followed by its compounding and discount factors.
+	
+		with open('book.csv') as source, open('factors.csv', 'w') as target:
+			compound_csv(source, target, report=print)
+	
+	Rows are read, parsed and computed in chunks of chunksize rows, so the
+	memory used does not depend on the size of the file: the specifications
+	of a chunk are parsed once per distinct value (a RateBook of the 
+	distinct rates, parse_periods for the periods) and the factors computed
+	by RateBook.compound (see compound_specs). When header is set the first
+	row is copied with the factors' names added.
+	
+	report, when given, is called after each chunk with a dict of its
+	statistics: chunk, rows, seconds and rows_per_second. The totals over
+	the file are returned in the same format (chunk being the number of
+	chunks).
+	"""
+	import csv
+	reader = csv.reader(source)
+	writer = csv.writer(target)
+	if header:
+		names = next(reader, None)
+		if names is not None:
+			writer.writerow(names + ['compound', 'discount'])
+	nchunks = nrows = 0
+	elapsed = 0.0
+	while True:
+		start = time.time()
+		rows = list(itertools.islice(reader, chunksize))
+		if not rows:
+			break
+		factors = compound_specs([r[rate_column] for r in rows], 
+			[r[period_column] for r in rows])
+		writer.writerows(row + [f, d] for row, f, d in zip(rows, 
+			factors.tolist(), (1.0/factors).tolist()))
+		seconds = time.time() - start
+		nchunks += 1
+		nrows += len(rows)
+		elapsed += seconds
+		if report is not None:
+			report(_throughput(nchunks, len(rows), seconds))
+	return _throughput(nchunks, nrows, elapsed)
+
+def compound_specs(rate_specs, period_specs):
+	"""
+	Return the compounding factors for columns of interest rate and period
+	specifications (see ir and period), one pair per row, in a few
+	vectorized passes.
+	"""
+	specs, inverse = np.unique(rate_specs, return_inverse=True)
+	book = RateBook.from_specs([str(s) for s in specs]).take(inverse)
+	starts, ends, sizes, units = parse_periods(period_specs)
+	factors = np.empty(len(book), dtype=np.float64)
+	ranges = ~np.isnat(starts)
+	if ranges.any():
+		factors[ranges] = book.take(ranges).compound(
+			DateRangePeriodArray((starts[ranges], ends[ranges])))
+	for unit in np.unique(units[~ranges]):
+		rows = ~ranges & (units == unit)
+		factors[rows] = book.take(rows).compound(
+			FixedTimePeriodArray(sizes[rows], str(unit)))
+	return factors
+
+def compound_columns(rates, starts, ends, conventions):
+	"""
+	Return the compounding factors for columns of a table: rates, starting
+	and ending dates and conventions, the specifications of ir without the
+	rate ('annual compounded business/252 calANBIMA').
+
+		df['compound'] = compound_columns(df.rate, df.start, df.end, df.convention)
+		factors = compound_columns(table['rate'], table['start'], table['end'],
+			table['convention'])
+
+	The columns are pandas Series, pyarrow Arrays (or ChunkedArrays) or NumPy
+	arrays, and the factors are returned alike: as a Series sharing the
+	index of rates, a pyarrow float64 Array or a NumPy array. pandas and
+	pyarrow are never imported unless given columns of theirs.
+
+	float64 rates and date32 or datetime64 dates are read in place, without
+	a Python object per row, and the rows are grouped by convention, each
+	group computed with a single InterestRate.compound_many call. Dictionary
+	encoded (categorical) conventions are used as they are, other ones are
+	encoded once. Null values are invalid.
+	"""
+	return _like_column(rates, _column_factors(rates, starts, ends, conventions),
+		'compound')
+
+def discount_columns(rates, starts, ends, conventions):
+	"""Return the discount factors for columns of a table (see compound_columns)."""
+	return _like_column(rates, 1.0/_column_factors(rates, starts, ends,
+		conventions), 'discount')
+
+def _column_factors(rates, starts, ends, conventions):
+	"""Return the compounding factors of compound_columns as a NumPy array."""
+	values = _column_values(rates)
+	n = len(values)
+	starts = _column_dates(starts)
+	ends = _column_dates(ends)
+	codes, names = _column_codes(conventions)
+	if len(starts) != n or len(ends) != n or len(codes) != n:
+		raise Exception('Invalid columns: all columns must have %d rows' % n)
+	factors = np.empty(n, dtype=np.float64)
+	if len(names) == 1:
+		groups = [(0, slice(None))]
+	else:
+		order = np.argsort(codes, kind='mergesort')
+		bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+		groups = [(code, order[lo:hi]) for code, (lo, hi) in
+			enumerate(zip(bounds[:-1], bounds[1:])) if hi > lo]
+	for code, rows in groups:
+		proto = ir('0 %s' % names[code])
+		rate = InterestRate(values[rows], proto.frequency, proto.compounding,
+			proto.daycount, proto.calendar)
+		factors[rows] = rate.compound_many((starts[rows], ends[rows]))
+	return factors
+
+def _library(column):
+	"""Return 'pandas', 'pyarrow' or None for the type of column."""
+	library = type(column).__module__.split('.')[0]
+	return library if library in ('pandas', 'pyarrow') else None
+
+def _arrow_array(column):
+	"""
+	Return a pyarrow Array for a column held by pyarrow, combining the
+	chunks of a ChunkedArray (a copy when there are several), or None.
+	"""
+	library = _library(column)
+	if library == 'pandas' and str(column.dtype).endswith('[pyarrow]'):
+		column = column.array.__arrow_array__()
+	elif library != 'pyarrow':
+		return None
+	if hasattr(column, 'chunks'):
+		if column.num_chunks == 1:
+			column = column.chunk(0)
+		elif hasattr(column.type, 'value_type'):
+			column = column.unify_dictionaries().combine_chunks()
+		else:
+			column = column.combine_chunks()
+	if column.null_count:
+		raise Exception('Invalid column: %d null values' % column.null_count)
+	return column
+
+def _column_values(column):
+	"""Return the float64 values of a column, in place when possible."""
+	array = _arrow_array(column)
+	if array is not None:
+		return array.to_numpy(zero_copy_only=str(array.type) == 'double')
+	if _library(column) == 'pandas':
+		column = column.to_numpy()
+	values = np.asarray(column, dtype=np.float64)
+	if np.isnan(values).any():
+		raise Exception('Invalid column: null values')
+	return values
+
+def _column_dates(column):
+	"""
+	Return the datetime64[D] dates of a column. The days of a date32 column
+	are read in place from its buffer and widened to datetime64[D].
+	"""
+	array = _arrow_array(column)
+	if array is not None:
+		if str(array.type) == 'date32[day]':
+			days = np.frombuffer(array.buffers()[1], dtype=np.int32,
+				count=len(array), offset=4*array.offset)
+			return days.astype('datetime64[D]')
+		column = array.to_numpy(zero_copy_only=False)
+	elif _library(column) == 'pandas':
+		column = column.to_numpy()
+	dates = np.asarray(column)
+	if dates.dtype.kind == 'M' and np.isnat(dates).any():
+		raise Exception('Invalid column: null values')
+	return dates.astype('datetime64[D]', copy=False)
+
+def _column_codes(column):
+	"""
+	Return the (codes, names) of a column of conventions: integer codes of
+	the rows indexing the distinct conventions names.
+	"""
+	array = _arrow_array(column)
+	if array is not None:
+		if not hasattr(array.type, 'value_type'):
+			array = array.dictionary_encode()
+		return (array.indices.to_numpy(zero_copy_only=False),
+			array.dictionary.to_pylist())
+	if _library(column) == 'pandas':
+		import pandas
+		if str(column.dtype) == 'category':
+			codes = column.cat.codes.to_numpy()
+			names = list(column.cat.categories)
+		else:
+			codes, names = pandas.factorize(column)
+			names = list(names)
+		if (codes < 0).any():
+			raise Exception('Invalid column: null values')
+		return codes, names
+	names, codes = np.unique(np.asarray(column), return_inverse=True)
+	return codes, [str(name) for name in names]
+
+def _like_column(column, values, name):
+	"""
+	Return the float64 array values as a column of the kind of column, a
+	Series being given its index and name.
+	"""
+	library = _library(column)
+	if library == 'pandas':
+		import pandas
+		return pandas.Series(values, index=column.index, name=name)
+	if library == 'pyarrow':
+		import pyarrow
+		return pyarrow.array(values, type=pyarrow.float64())
+	return values
+
+def _throughput(chunk, rows, seconds):
+	return {'chunk': chunk, 'rows': rows, 'seconds': seconds, 
+		'rows_per_second': rows/seconds if seconds else float('inf')}
+
+def _open_csv(fname, mode):
+	"""Open fname ('-' for the standard streams) for the csv module."""
+	if fname == '-':
+		return sys.stdin if mode == 'r' else sys.stdout
+	if sys.version_info[0] < 3:
+		return open(fname, mode + 'b')
+	return open(fname, mode, newline='')
+
+def main(argv=None):
+	"""
+	Command line interface, computing the factors of a CSV file:
+	
+		python -m fixedincome book.csv factors.csv --chunksize 100000
+	
+	The throughput of each chunk is reported to the standard error.
+	"""
+	import argparse
+	parser = argparse.ArgumentParser(prog='python -m fixedincome',
+		description='Compute the compounding and discount factors of the \
+			interest rate and period specifications of a CSV file.')
+	parser.add_argument('source', help='input CSV file, - for stdin')
+	parser.add_argument('target', nargs='?', default='-', 
+		help='output CSV file, - for stdout (default)')
+	parser.add_argument('--chunksize', type=int, default=100000,
+		help='rows computed at once (default 100000)')
+	parser.add_argument('--no-header', dest='header', action='store_false',
+		help='the input has no header row')
+	parser.add_argument('--rate-column', type=int, default=0,
+		help='index of the rate specifications column (default 0)')
+	parser.add_argument('--period-column', type=int, default=1,
+		help='index of the period specifications column (default 1)')
+	parser.add_argument('--quiet', action='store_true', 
+		help='do not report the throughput')
+	args = parser.parse_args(argv)
+	def report(stats):
+		sys.stderr.write('chunk %(chunk)d: %(rows)d rows in %(seconds).3fs, '
+			'%(rows_per_second).0f rows/s\n' % stats)
+	source = _open_csv(args.source, 'r')
+	target = _open_csv(args.target, 'w')
+	try:
+		total = compound_csv(source, target, args.chunksize, args.header,
+			args.rate_column, args.period_column, None if args.quiet else report)
+	finally:
+		if source is not sys.stdin:
+			source.close()
+		if target is not sys.stdout:
+			target.close()
+	if not args.quiet:
+		sys.stderr.write('total: %(rows)d rows in %(chunk)d chunks, %(seconds).3fs, '
+			'%(rows_per_second).0f rows/s\n' % total)
 
+# the names of from fixedincome import *: without __all__, Calendar, which
+# __getattr__ imports lazily, would be left out on Python 3.7+
+__all__ = sorted(set(name for name in globals() if not name.startswith('_')) |
+	set(['Calendar']))
 
+if __name__ == '__main__':
+	main()
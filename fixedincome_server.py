@@ -0,0 +1,338 @@
+"""
+Local micro-batching pricing service over the fixedincome API (Python 3).
+
+	python fixedincome_server.py serve --port 8765 --batch-size 256 --max-wait 0.002
+	python fixedincome_server.py load --port 8765 --requests 100000 --concurrency 64
+
+The server speaks JSON lines over TCP (or over a Unix socket, with --unix).
+Each request holds an interest rate and a period specification (see ir and
+period) and an optional id, which is echoed in the answer:
+
+	{"id": 1, "rate": "0.1 annual compounded business/252 calANBIMA", "period": "2015-01-02:2016-01-04"}
+	{"id": 1, "compound": 1.1003..., "discount": 0.9088...}
+
+Invalid requests are answered with an "error" member and {"metrics": true}
+is answered with the server metrics (see Metrics). Answers on a connection
+come in the order of its requests.
+
+Concurrent requests, from every connection, are coalesced into batches of
+up to batch_size requests, waiting at most max_wait seconds after the first
+one, and each batch is computed at once by compound_specs.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import collections
+import numpy as np
+from fixedincome import ir, period, compound_specs
+
+
+class Metrics(object):
+	"""
+	Metrics class
+
+	Counts of the answered requests, errors and batches, the throughput
+	since the server started and the p50/p99 latencies (from the arrival of
+	a request to its answer) of the last window requests.
+	"""
+	def __init__(self, window=100000):
+		self.latencies = collections.deque(maxlen=window)
+		self.requests = 0
+		self.errors = 0
+		self.batches = 0
+		self.started = time.time()
+
+	def record(self, latencies, errors):
+		"""Record the latencies, in seconds, and the errors of a batch."""
+		self.latencies.extend(latencies)
+		self.requests += len(latencies)
+		self.errors += errors
+		self.batches += 1
+
+	def snapshot(self):
+		"""Return the metrics as a dict, latencies in milliseconds."""
+		latencies = np.array(self.latencies)
+		p50, p99 = np.percentile(latencies, [50, 99])*1000 if len(latencies) \
+			else (0.0, 0.0)
+		elapsed = time.time() - self.started
+		return {'requests': self.requests, 'errors': self.errors,
+			'batches': self.batches,
+			'mean_batch': self.requests/float(self.batches) if self.batches else 0.0,
+			'p50_ms': float(p50), 'p99_ms': float(p99),
+			'throughput': self.requests/elapsed if elapsed else 0.0}
+
+
+class PricingServer(object):
+	"""
+	PricingServer class
+
+		server = PricingServer(batch_size=256, max_wait=0.002)
+		await server.start('127.0.0.1', 8765)
+		...
+		await server.close()
+	"""
+	def __init__(self, batch_size=256, max_wait=0.002):
+		if batch_size < 1 or max_wait < 0:
+			raise Exception('Invalid batching: batch_size must be positive and \
+				max_wait not negative.')
+		self.batch_size = batch_size
+		self.max_wait = max_wait
+		self.metrics = Metrics()
+		self._queue = None
+		self._server = None
+		self._batcher = None
+
+	async def start(self, host='127.0.0.1', port=0, path=None):
+		"""
+		Listen on host:port (port 0 picks a free one, see address) or on
+		the Unix socket path when given.
+		"""
+		self._queue = asyncio.Queue()
+		self._batcher = asyncio.ensure_future(self._batches())
+		if path is not None:
+			self._server = await asyncio.start_unix_server(self._handle, path)
+		else:
+			self._server = await asyncio.start_server(self._handle, host, port)
+		return self
+
+	def __get_address(self):
+		return self._server.sockets[0].getsockname()
+	address = property(__get_address)
+
+	async def serve_forever(self):
+		async with self._server:
+			await self._server.serve_forever()
+
+	async def close(self):
+		self._server.close()
+		await self._server.wait_closed()
+		self._batcher.cancel()
+		try:
+			await self._batcher
+		except asyncio.CancelledError:
+			pass
+
+	async def _handle(self, reader, writer):
+		answers = asyncio.Queue()
+		sender = asyncio.ensure_future(self._send(writer, answers))
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				answers.put_nowait(self._submit(line))
+		finally:
+			answers.put_nowait(None)
+			await sender
+			writer.close()
+
+	def _submit(self, line):
+		"""Return the future answer to a request line."""
+		answer = asyncio.get_event_loop().create_future()
+		try:
+			request = json.loads(line)
+			if not isinstance(request, dict):
+				raise ValueError('a JSON object is expected')
+		except ValueError as e:
+			answer.set_result({'error': 'Invalid request: %s' % e})
+			return answer
+		if request.get('metrics'):
+			answer.set_result(self.metrics.snapshot())
+		elif not isinstance(request.get('rate'), str) or \
+				not isinstance(request.get('period'), str):
+			answer.set_result({'id': request.get('id'),
+				'error': 'Invalid request: rate and period are required'})
+		else:
+			self._queue.put_nowait((request['rate'], request['period'],
+				request.get('id'), time.perf_counter(), answer))
+		return answer
+
+	async def _send(self, writer, answers):
+		"""Write the answers of a connection, in the order of its requests."""
+		while True:
+			answer = await answers.get()
+			if answer is None:
+				break
+			writer.write((json.dumps(await answer) + '\n').encode())
+			if answers.empty():
+				await writer.drain()
+
+	async def _batches(self):
+		"""Coalesce the queued requests into batches and answer them."""
+		loop = asyncio.get_event_loop()
+		while True:
+			batch = [await self._queue.get()]
+			deadline = loop.time() + self.max_wait
+			while len(batch) < self.batch_size:
+				if not self._queue.empty():
+					batch.append(self._queue.get_nowait())
+					continue
+				timeout = deadline - loop.time()
+				if timeout <= 0:
+					break
+				try:
+					batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+				except asyncio.TimeoutError:
+					break
+			results = await loop.run_in_executor(None, _compute,
+				[b[0] for b in batch], [b[1] for b in batch])
+			now = time.perf_counter()
+			latencies = []
+			errors = 0
+			for (rate, period, id_, arrival, answer), result in zip(batch, results):
+				if isinstance(result, str):
+					errors += 1
+					result = {'id': id_, 'error': result}
+				else:
+					result = {'id': id_, 'compound': result, 'discount': 1.0/result}
+				if not answer.cancelled():
+					answer.set_result(result)
+				latencies.append(now - arrival)
+			self.metrics.record(latencies, errors)
+
+
+def _compute(rates, periods):
+	"""
+	Return the compounding factors of a batch, or error messages for the
+	invalid requests. The distinct specifications are parsed first, once
+	each, so that the invalid requests are set aside and the others are
+	computed at once.
+	"""
+	results = [None]*len(rates)
+	for specs, parse in ((rates, ir), (periods, period)):
+		invalid = {}
+		for spec in set(specs):
+			try:
+				parse(spec)
+			except Exception as e:
+				invalid[spec] = 'Invalid request: %s' % e
+		if invalid:
+			for i, spec in enumerate(specs):
+				results[i] = results[i] or invalid.get(spec)
+	valid = [i for i, result in enumerate(results) if result is None]
+	if not valid:
+		return results
+	try:
+		factors = compound_specs([rates[i] for i in valid],
+			[periods[i] for i in valid]).tolist()
+	except Exception:
+		# valid specifications failing together, computed one by one
+		factors = [_compute_one(rates[i], periods[i]) for i in valid]
+	for i, factor in zip(valid, factors):
+		results[i] = factor
+	return results
+
+def _compute_one(rate_spec, period_spec):
+	"""Return the compounding factor of a request, or its error message."""
+	try:
+		return float(compound_specs([rate_spec], [period_spec])[0])
+	except Exception as e:
+		return 'Invalid request: %s' % e
+
+
+# request mix of the load generator
+SPECS = [
+	'annual compounded business/252 calANBIMA',
+	'annual simple actual/360',
+	'semi-annual compounded 30/360',
+]
+
+def _requests(n, seed):
+	rng = np.random.RandomState(seed)
+	for i in range(n):
+		start = np.datetime64('2015-01-02') + rng.randint(0, 365)
+		end = start + rng.randint(1, 3650)
+		yield {'id': i, 'rate': '%.4f %s' % (0.05 + 0.1*rng.rand(),
+			SPECS[rng.randint(len(SPECS))]), 'period': '%s:%s' % (start, end)}
+
+async def _connect(host, port, path):
+	if path is not None:
+		return await asyncio.open_unix_connection(path)
+	return await asyncio.open_connection(host, port)
+
+async def load(host='127.0.0.1', port=8765, path=None, requests=10000,
+		concurrency=64, seed=0):
+	"""
+	Load generator: send requests from concurrency connections, each one
+	waiting for an answer before its next request, and return the answers,
+	the client side latencies and throughput, and the server metrics.
+	"""
+	answers = []
+	latencies = []
+	async def client(k):
+		reader, writer = await _connect(host, port, path)
+		try:
+			for request in _requests(requests//concurrency +
+					(k < requests % concurrency), seed + k):
+				start = time.perf_counter()
+				writer.write((json.dumps(request) + '\n').encode())
+				answer = json.loads(await reader.readline())
+				latencies.append(time.perf_counter() - start)
+				answers.append((request, answer))
+		finally:
+			writer.close()
+	start = time.perf_counter()
+	await asyncio.gather(*[client(k) for k in range(concurrency)])
+	elapsed = time.perf_counter() - start
+	reader, writer = await _connect(host, port, path)
+	writer.write(b'{"metrics": true}\n')
+	metrics = json.loads(await reader.readline())
+	writer.close()
+	p50, p99 = np.percentile(latencies, [50, 99])*1000 if latencies else (0, 0)
+	client_stats = {'requests': len(answers), 'seconds': elapsed,
+		'throughput': len(answers)/elapsed, 'p50_ms': p50, 'p99_ms': p99}
+	return answers, client_stats, metrics
+
+def run_local(requests=10000, concurrency=64, batch_size=256, max_wait=0.002):
+	"""
+	Run a server on a free local port and the load generator against it,
+	returning the results of load.
+	"""
+	async def run():
+		server = PricingServer(batch_size, max_wait)
+		await server.start('127.0.0.1', 0)
+		try:
+			return await load('127.0.0.1', server.address[1], None, requests,
+				concurrency)
+		finally:
+			await server.close()
+	return asyncio.run(run())
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Micro-batching pricing \
+		service over the fixedincome API.')
+	commands = parser.add_subparsers(dest='command')
+	commands.required = True
+	serve = commands.add_parser('serve', help='run the server')
+	serve.add_argument('--batch-size', type=int, default=256)
+	serve.add_argument('--max-wait', type=float, default=0.002,
+		help='seconds waited for a batch to fill (default 0.002)')
+	client = commands.add_parser('load', help='run the load generator')
+	client.add_argument('--requests', type=int, default=10000)
+	client.add_argument('--concurrency', type=int, default=64)
+	for command in (serve, client):
+		command.add_argument('--host', default='127.0.0.1')
+		command.add_argument('--port', type=int, default=8765)
+		command.add_argument('--unix', help='Unix socket path')
+	args = parser.parse_args(argv)
+	if args.command == 'serve':
+		async def run():
+			server = PricingServer(args.batch_size, args.max_wait)
+			await server.start(args.host, args.port, args.unix)
+			sys.stderr.write('serving on %s\n' % (args.unix or
+				'%s:%d' % server.address[:2]))
+			await server.serve_forever()
+		asyncio.run(run())
+	else:
+		answers, stats, metrics = asyncio.run(load(args.host, args.port,
+			args.unix, args.requests, args.concurrency))
+		print('client: %(requests)d requests in %(seconds).3fs, '
+			'%(throughput).0f requests/s, p50 %(p50_ms).2fms, p99 %(p99_ms).2fms' % stats)
+		print('server: %(requests)d requests, %(batches)d batches (mean size '
+			'%(mean_batch).1f), p50 %(p50_ms).2fms, p99 %(p99_ms).2fms, '
+			'%(errors)d errors' % metrics)
+
+if __name__ == '__main__':
+	main()
@@ -1,9 +1,18 @@
 #!/usr/local/bin/python
 # encoding: utf-8
 
+import os
 import math
+import pickle
+import shutil
+import tempfile
 import unittest
-from datetime import date
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+import numpy as np
+from datetime import date, timedelta
 from fixedincome import *
 from bizdays import Calendar
 
@@ -361,6 +370,1335 @@ class TestInterestRate(unittest.TestCase):
 		with self.assertRaises(Exception):
 			ir('0.01 semi-annual compounded actual/365 calTest')
 	
+class TestVectorized(unittest.TestCase):
+	def setUp(self):
+		self.starts = ['2012-07-12', '2012-07-12', '2012-01-01', '2013-05-13']
+		self.ends = ['2012-07-16', '2012-07-22', '2014-06-30', '2013-05-13']
+		self.sizes = [0, 1, 1.5, 2.25, 12, 37.5]
+	
+	def _scalar_dates(self, ir_):
+		return [ir_.compound(period('%s:%s' % d)) 
+			for d in zip(self.starts, self.ends)]
+	
+	def test_period_array(self):
+		'period_array instanciation'
+		p = period_array((self.starts, self.ends))
+		self.assertEqual(type(p), DateRangePeriodArray)
+		self.assertEqual(p.size().tolist(), [4, 10, 911, 0])
+		self.assertEqual(len(p), 4)
+		p = period_array(self.sizes, 'month')
+		self.assertEqual(type(p), FixedTimePeriodArray)
+		self.assertEqual(p.unit, 'month')
+		self.assertEqual(p.size().tolist(), self.sizes)
+		p = period_array([period('1 month'), period('2.5 months')])
+		self.assertEqual(p.unit, 'month')
+		self.assertEqual(p.size().tolist(), [1.0, 2.5])
+		self.assertTrue(period_array(p) is p)
+		
+		with self.assertRaises(Exception):
+			period_array((['2012-12-12'], ['2012-10-16']))
+		with self.assertRaises(Exception):
+			period_array([period('1 month'), period('1 day')])
+	
+	def test_compound_many_dates(self):
+		'InterestRate compound_many over date ranges matches compound'
+		for comp in Compounding.names:
+			for freq in Frequency.names:
+				for dc in ('actual/360', 'actual/365', 'actual/364'):
+					ir_ = InterestRate(0.1125, Frequency(freq), Compounding(comp),
+						DayCount(dc))
+					f = ir_.compound_many((self.starts, self.ends))
+					self.assertEqual(f.tolist(), self._scalar_dates(ir_))
+	
+	def test_compound_many_sizes(self):
+		'InterestRate compound_many over fixed periods matches compound'
+		for comp in Compounding.names:
+			for unit in TimeUnit.names:
+				ir_ = ir('0.0725 semi-annual %s business/252' % comp)
+				f = ir_.compound_many(self.sizes, unit)
+				self.assertEqual(f.tolist(), 
+					[ir_.compound(FixedTimePeriod(s, unit)) for s in self.sizes])
+	
+	def test_compound_many_calendar(self):
+		'InterestRate compound_many with calendar matches compound'
+		starts = ['2002-07-12', '2012-12-20', '2001-12-31']
+		ends = ['2002-07-22', '2013-01-10', '2002-01-02']
+		for comp in Compounding.names:
+			ir_ = ir('0.1 annual %s business/252 calTest' % comp)
+			f = ir_.compound_many((starts, ends))
+			self.assertEqual(f.tolist(), [ir_.compound(period('%s:%s' % d))
+				for d in zip(starts, ends)])
+	
+	def test_discount_many(self):
+		'InterestRate discount_many and module level discount'
+		ir_ = ir('0.06 annual continuous actual/365')
+		f = ir_.discount_many((self.starts, self.ends))
+		self.assertEqual(f.tolist(), 
+			[1.0/c for c in self._scalar_dates(ir_)])
+		self.assertEqual(discount(ir_, (self.starts, self.ends)).tolist(),
+			f.tolist())
+		self.assertEqual(compound(ir_, self.sizes, 'year').tolist(),
+			ir_.compound_many(self.sizes, 'year').tolist())
+		p = period('2012-07-12:2012-07-16')
+		self.assertEqual(discount(ir_, p), 1.0/ir_.compound(p))
+
+class TestCalendarIndex(unittest.TestCase):
+	def _brute_bizdays(self, idx, d1, d2):
+		hol = set(idx.holidays)
+		n = 0
+		for i in range(d1.toordinal(), d2.toordinal() + 1):
+			d = date.fromordinal(i)
+			if d.weekday() not in idx.weekend and d not in hol:
+				n += 1
+		return max(n - 1, 0)
+	
+	def test_from_file(self):
+		'CalendarIndex loading a .cal file'
+		idx = CalendarIndex.from_file('Test.cal')
+		self.assertEqual(idx.name, 'Test')
+		self.assertEqual(idx.weekend, (5, 6))
+		self.assertEqual(idx.holidays, (date(2001, 1, 1), date(2002, 1, 1),
+			date(2012, 12, 25), date(2013, 1, 1)))
+		self.assertEqual(idx.startdate, date(2001, 1, 1))
+		self.assertEqual(idx.enddate, date(2013, 12, 31))
+		self.assertEqual(idx, Calendar('Test'))
+		with self.assertRaises(AttributeError):
+			idx.name = 'test'
+	
+	def test_weekdays_fixtures(self):
+		'CalendarIndex weekends only counting'
+		idx = CalendarIndex([], name='weekends')
+		for weekday in ('monday', 'tuesday', 'wednesday', 'thursday', 
+				'friday', 'saturday', 'sunday'):
+			starts, ends, counts = [], [], []
+			for l in open('%s.csv' % weekday):
+				d1, d2, wd = l.strip().split(',')
+				self.assertEqual(idx.bizdays((d1, d2)), int(wd))
+				starts.append(d1)
+				ends.append(d2)
+				counts.append(int(wd))
+			self.assertEqual(idx.bizdays_many(starts, ends).tolist(), counts)
+	
+	def test_bizdays(self):
+		'CalendarIndex bizdays inside and outside the holidays span'
+		idx = CalendarIndex.from_file('ANBIMA.cal')
+		pairs = [(date(2002, 7, 12), date(2002, 7, 22)), 
+			(date(2012, 12, 20), date(2013, 1, 10)),
+			(date(1998, 3, 4), date(2001, 1, 9)),
+			(date(2078, 12, 1), date(2079, 2, 13)),
+			(date(1999, 12, 31), date(2080, 1, 2)),
+			(date(2013, 5, 11), date(2013, 5, 13)),
+			(date(2013, 5, 11), date(2013, 5, 12)),
+			(date(2013, 5, 13), date(2013, 5, 13))]
+		for d1, d2 in pairs:
+			n = self._brute_bizdays(idx, d1, d2)
+			self.assertEqual(idx.bizdays((d1, d2)), n)
+			self.assertEqual(idx.bizdays((d1.isoformat(), d2.isoformat())), n)
+		starts, ends = zip(*pairs)
+		self.assertEqual(idx.bizdays_many(starts, ends).tolist(),
+			[self._brute_bizdays(idx, d1, d2) for d1, d2 in pairs])
+	
+	def test_CalendarRangePeriod(self):
+		'CalendarRangePeriod size uses the calendar index'
+		p = period('2012-12-20:2013-01-10')
+		c = CalendarRangePeriod(p, Calendar('Test'))
+		self.assertEqual(c.size(), Calendar('Test').bizdays(('2012-12-20', 
+			'2013-01-10')))
+		self.assertTrue(calendar_index(c.calendar) is 
+			calendar_index(Calendar('Test')))
+		self.assertEqual(CalendarRangePeriod(p, calendar_index(c.calendar)).size(),
+			c.size())
+
+class TestCalendarRegistry(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		shutil.copy('Test.cal', self.tmpdir)
+		self.registry = CalendarRegistry([self.tmpdir], interval=0)
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+	
+	def test_get(self):
+		'CalendarRegistry shares calendar instances'
+		cal = self.registry.get('Test')
+		self.assertTrue(self.registry.get('Test') is cal)
+		self.assertEqual(self.registry.stats(), {'hits': 1, 'misses': 1, 
+			'reloads': 0, 'calendars': ('Test',)})
+		self.assertTrue('Test' in self.registry)
+		with self.assertRaises(Exception):
+			self.registry.get('Blah')
+	
+	def test_reload(self):
+		'CalendarRegistry reloads modified calendars'
+		cal = self.registry.get('Test')
+		fname = os.path.join(self.tmpdir, 'Test.cal')
+		with open(fname, 'a') as f:
+			f.write('\n2013-05-13\n')
+		mtime = os.path.getmtime(fname) + 10
+		os.utime(fname, (mtime, mtime))
+		cal2 = self.registry.get('Test')
+		self.assertFalse(cal2 is cal)
+		self.assertEqual(len(cal2.holidays), len(cal.holidays) + 1)
+		self.assertEqual(self.registry.reloads, 1)
+	
+	def test_interval(self):
+		'CalendarRegistry checks the files at most once every interval'
+		registry = CalendarRegistry([self.tmpdir], interval=3600)
+		cal = registry.get('Test')
+		fname = os.path.join(self.tmpdir, 'Test.cal')
+		mtime = os.path.getmtime(fname) + 10
+		os.utime(fname, (mtime, mtime))
+		self.assertTrue(registry.get('Test') is cal)
+		registry.interval = 0
+		self.assertFalse(registry.get('Test') is cal)
+		self.assertEqual(registry.reloads, 1)
+	
+	def test_lookup(self):
+		'CalendarRegistry lookup returns None for missing files, throttled'
+		registry = CalendarRegistry([self.tmpdir], interval=3600)
+		self.assertTrue(registry.lookup('Test') is registry.get('Test'))
+		self.assertTrue(registry.lookup('Blah') is None)
+		shutil.copy('Test.cal', os.path.join(self.tmpdir, 'Blah.cal'))
+		self.assertTrue(registry.lookup('Blah') is None)
+		self.assertRaises(Exception, registry.get, 'Blah')
+		registry.interval = 0
+		self.assertTrue(registry.lookup('Blah') is not None)
+	
+	def test_preload(self):
+		'CalendarRegistry preload and clear'
+		self.registry.preload('Test')
+		self.assertEqual(self.registry.misses, 1)
+		self.registry.get('Test')
+		self.assertEqual(self.registry.hits, 1)
+		self.registry.clear()
+		self.assertEqual(self.registry.names(), ())
+		self.assertEqual(self.registry.hits, 0)
+	
+	def test_ir_calendar(self):
+		'ir and CalendarRangePeriod share the registry calendars'
+		ir1 = ir('0.1 annual simple business/252 calTest')
+		ir2 = ir('0.2 annual compounded business/252 calTest')
+		self.assertTrue(ir1.calendar is ir2.calendar)
+		self.assertTrue(ir1.calendar is calendars.get('Test'))
+		c = CalendarRangePeriod(period('2002-07-12:2002-07-22'), Calendar('Test'))
+		self.assertTrue(calendar_index(c.calendar) is ir1.calendar)
+		exists = os.path.exists
+		calls = []
+		def counted(fname):
+			calls.append(fname)
+			return exists(fname)
+		interval = calendars.interval
+		calendars.interval = 3600
+		os.path.exists = counted
+		try:
+			for i in range(10):
+				c.size()
+		finally:
+			os.path.exists = exists
+			calendars.interval = interval
+		self.assertEqual(calls, [])
+
+class TestCompiledCalendar(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.fname = os.path.join(self.tmpdir, 'ANBIMA.cal')
+		shutil.copy('ANBIMA.cal', self.fname)
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+	
+	def _touch(self, fname, delta):
+		mtime = os.path.getmtime(fname) + delta
+		os.utime(fname, (mtime, mtime))
+	
+	def test_compile_calendar(self):
+		'compile_calendar and CalendarIndex.from_compiled'
+		output = compile_calendar(self.fname)
+		self.assertEqual(output, self.fname + 'c')
+		idx = CalendarIndex.from_file(self.fname)
+		cidx = CalendarIndex.from_compiled(output)
+		self.assertEqual(cidx.name, 'ANBIMA')
+		self.assertEqual(cidx.weekend, idx.weekend)
+		self.assertEqual(cidx.holidays, idx.holidays)
+		self.assertEqual(cidx.startdate, idx.startdate)
+		self.assertEqual(cidx.enddate, idx.enddate)
+		starts = ['1999-02-03', '2002-07-12', '2013-05-11', '2070-01-01']
+		ends = ['2001-02-03', '2012-12-31', '2013-05-13', '2090-01-01']
+		self.assertEqual(cidx.bizdays_many(starts, ends).tolist(), 
+			idx.bizdays_many(starts, ends).tolist())
+		self.assertEqual(cidx.bizdays(('2002-07-12', '2002-07-22')), 
+			idx.bizdays(('2002-07-12', '2002-07-22')))
+	
+	def test_invalid_compiled(self):
+		'CalendarIndex.from_compiled rejects invalid files'
+		with open(self.fname + 'c', 'wb') as f:
+			f.write(b'not a compiled calendar file')
+		with self.assertRaises(Exception):
+			CalendarIndex.from_compiled(self.fname + 'c')
+	
+	def test_registry_prefers_compiled(self):
+		'CalendarRegistry prefers compiled calendars newer than the source'
+		registry = CalendarRegistry([self.tmpdir], interval=0)
+		# compile a calendar with an extra holiday, to tell them apart
+		extra = os.path.join(self.tmpdir, 'extra.cal')
+		shutil.copy(self.fname, extra)
+		with open(extra, 'a') as f:
+			f.write('\n2079-01-02\n')
+		compile_calendar(extra, self.fname + 'c')
+		self._touch(self.fname + 'c', 10)
+		cal = registry.get('ANBIMA')
+		self.assertEqual(cal.name, 'ANBIMA')
+		self.assertEqual(cal.holidays[-1], date(2079, 1, 2))
+		self._touch(self.fname, 20)
+		cal = registry.get('ANBIMA')
+		self.assertEqual(cal.holidays[-1], date(2078, 12, 25))
+	
+	def test_registry_recompiled(self):
+		'CalendarRegistry reloads calendars compiled again'
+		registry = CalendarRegistry([self.tmpdir], interval=0)
+		compile_calendar(self.fname, self.fname + 'c')
+		self._touch(self.fname + 'c', 10)
+		cal = registry.get('ANBIMA')
+		self.assertEqual(cal.holidays[-1], date(2078, 12, 25))
+		extra = os.path.join(self.tmpdir, 'extra.cal')
+		shutil.copy(self.fname, extra)
+		with open(extra, 'a') as f:
+			f.write('\n2079-01-02\n')
+		compile_calendar(extra, self.fname + 'c')
+		self._touch(self.fname + 'c', 20)
+		cal = registry.get('ANBIMA')
+		self.assertEqual(cal.holidays[-1], date(2079, 1, 2))
+		self.assertEqual(registry.reloads, 1)
+
+class TestCaches(unittest.TestCase):
+	def test_LRUCache(self):
+		'LRUCache eviction and counters'
+		cache = LRUCache(2)
+		cache.set('a', 1)
+		cache.set('b', 2)
+		self.assertEqual(cache.get('a'), 1)
+		cache.set('c', 3)
+		self.assertFalse('b' in cache)
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 2,
+			'maxsize': 2})
+		cache.resize(1)
+		self.assertEqual(len(cache), 1)
+		self.assertTrue('c' in cache)
+		cache.resize(0)
+		cache.set('d', 4)
+		self.assertEqual(len(cache), 0)
+		cache.clear()
+		self.assertEqual(cache.hits, 0)
+	
+	def test_ir_cache(self):
+		'ir returns cached InterestRate objects'
+		ir_cache.clear()
+		ir_templates.clear()
+		ir1 = ir('0.06 annual simple actual/365')
+		self.assertTrue(ir('0.06 annual simple actual/365') is ir1)
+		self.assertEqual(ir_cache.stats()['hits'], 1)
+		ir2 = ir('0.07 annual simple actual/365')
+		self.assertEqual(ir2.rate, 0.07)
+		self.assertTrue(ir2.daycount is ir1.daycount)
+		self.assertTrue(ir2.compounding is ir1.compounding)
+		self.assertEqual(ir_templates.stats()['hits'], 1)
+		with self.assertRaises(AttributeError):
+			ir1.rate = 0.1
+		with self.assertRaises(Exception):
+			ir('annual simple actual/365')
+		with self.assertRaises(Exception):
+			ir('0.06 simple actual/365')
+		size = len(ir_templates)
+		for spec in ('0.06 annual simple actual/365 US', '0.06 annual simple 30/360 XX'):
+			for i in range(2):
+				self.assertRaises(Exception, ir, spec)
+		self.assertEqual(len(ir_templates), size)
+	
+	def test_ir_cache_calendar(self):
+		'cached rates with a calendar do not look up its file on every hit'
+		spec = '0.1 annual compounded business/252 calANBIMA'
+		interval = calendars.interval
+		getmtime = os.path.getmtime
+		stats = []
+		def counted(fname):
+			stats.append(fname)
+			return getmtime(fname)
+		calendars.interval = 3600
+		os.path.getmtime = counted
+		try:
+			r = ir(spec)
+			for i in range(100):
+				self.assertTrue(ir(spec) is r)
+			self.assertTrue(len(stats) <= 1)
+		finally:
+			os.path.getmtime = getmtime
+			calendars.interval = interval
+	
+	def test_period_cache(self):
+		'period caches parsed specifications'
+		period_cache.clear()
+		p1 = period('2012-07-12:2012-07-16')
+		p2 = period('2012-07-12:2012-07-16')
+		self.assertFalse(p1 is p2)
+		self.assertEqual(p1.dates, p2.dates)
+		self.assertEqual(period_cache.stats()['hits'], 1)
+		period('1.5 months')
+		self.assertEqual(period('1.5 months').size(), 1.5)
+		self.assertEqual(period_cache.stats()['hits'], 2)
+
+class TestFlyweights(unittest.TestCase):
+	def test_interned(self):
+		'Conventions are interned flyweights'
+		self.assertTrue(DayCount('actual/360') is DayCount('actual/360'))
+		self.assertTrue(Frequency('annual') is Frequency('annual'))
+		self.assertTrue(Compounding('simple') is Compounding('simple'))
+		self.assertNotEqual(Frequency('annual'), Frequency('monthly'))
+		self.assertNotEqual(Frequency('annual'), None)
+		self.assertEqual(len(set([Compounding('simple'), Compounding('simple')])), 1)
+	
+	def test_slots(self):
+		'Conventions, periods and rates have no instance dict'
+		objs = [DayCount('actual/360'), Frequency('annual'), 
+			Compounding('simple'), period('1 month'), period('2012-07-12:2012-07-16'),
+			ir('0.06 annual simple actual/365')]
+		for obj in objs:
+			self.assertFalse(hasattr(obj, '__dict__'))
+	
+	def test_pickle(self):
+		'Pickled conventions unpickle to the interned instances'
+		ir_ = InterestRate(0.1, Frequency('annual'), Compounding('continuous'), 
+			DayCount('actual/360'))
+		ir2 = pickle.loads(pickle.dumps(ir_, 2))
+		self.assertEqual(ir2.rate, 0.1)
+		self.assertTrue(ir2.daycount is DayCount('actual/360'))
+		self.assertTrue(ir2.compounding is Compounding('continuous'))
+
+class TestRateBook(unittest.TestCase):
+	def setUp(self):
+		self.specs = ['0.1 annual compounded business/252 calTest',
+			'0.05 annual simple actual/360',
+			'0.11 annual compounded business/252 calTest',
+			'0.07 semi-annual continuous actual/365',
+			'0.051 annual simple actual/360']
+		self.starts = ['2002-07-12', '2012-12-20', '2001-12-31', '2012-07-12',
+			'2012-01-01']
+		self.ends = ['2002-07-22', '2013-01-10', '2002-01-02', '2012-07-22',
+			'2014-06-30']
+	
+	def test_RateBook(self):
+		'RateBook from specs'
+		book = RateBook.from_specs(self.specs)
+		self.assertEqual(len(book), 5)
+		self.assertEqual(book.rates.tolist(), [0.1, 0.05, 0.11, 0.07, 0.051])
+		self.assertEqual(len(book.calendars), 1)
+		self.assertEqual(len(book.groups()), 3)
+		for spec, i in zip(self.specs, range(5)):
+			ir_ = ir(spec)
+			self.assertEqual(book[i].rate, ir_.rate)
+			self.assertEqual(book[i].daycount, ir_.daycount)
+			self.assertEqual(book[i].calendar, ir_.calendar)
+		with self.assertRaises(Exception):
+			RateBook([0.1, 0.2], [0], [0, 0], [0, 0])
+	
+	def test_RateBook_compound(self):
+		'RateBook compound and discount match InterestRate'
+		book = RateBook.from_specs(self.specs)
+		expected = [ir(spec).compound(period('%s:%s' % d)) 
+			for spec, d in zip(self.specs, zip(self.starts, self.ends))]
+		self.assertEqual(book.compound((self.starts, self.ends)).tolist(), expected)
+		self.assertEqual(book.discount((self.starts, self.ends)).tolist(), 
+			[1.0/f for f in expected])
+		p = period('2012-07-12:2012-07-22')
+		self.assertEqual(book.compound(p).tolist(), 
+			[ir(spec).compound(p) for spec in self.specs])
+		self.assertEqual(book.compound([1, 2, 3, 4, 5], 'month').tolist(),
+			[ir(spec).compound(FixedTimePeriod(n, 'month')) 
+				for spec, n in zip(self.specs, [1, 2, 3, 4, 5])])
+		with self.assertRaises(Exception):
+			book.compound([1, 2], 'month')
+
+class TestYieldCurve(unittest.TestCase):
+	def setUp(self):
+		self.dates = ['2013-06-03', '2013-07-01', '2014-01-02', '2015-01-02']
+		self.rates = [0.075, 0.078, 0.085, 0.093]
+	
+	def test_knots(self):
+		'YieldCurve reproduces the knots'
+		for interp in YieldCurve.interpolations:
+			for spec in ('annual compounded business/252 calANBIMA',
+					'annual simple actual/360', 'annual continuous actual/365'):
+				curve = YieldCurve('2013-05-13', self.dates, self.rates, spec, 
+					interp)
+				for r, d in zip(self.rates, self.dates):
+					self.assertAlmostEqual(curve.rate([d])[0], r, 12)
+				ir_ = ir('%s %s' % (self.rates[1], spec))
+				self.assertAlmostEqual(curve.discount([self.dates[1]])[0], 
+					ir_.discount(period('2013-05-13:%s' % self.dates[1])), 14)
+	
+	def test_interpolation(self):
+		'YieldCurve interpolations'
+		spec = 'annual compounded business/252 calANBIMA'
+		cal = calendars.get('ANBIMA')
+		d = '2013-09-02'
+		n1 = cal.bizdays(('2013-05-13', self.dates[1]))
+		n2 = cal.bizdays(('2013-05-13', self.dates[2]))
+		n = cal.bizdays(('2013-05-13', d))
+		f1 = (1 + self.rates[1])**(n1/252.0)
+		f2 = (1 + self.rates[2])**(n2/252.0)
+		# flat forward on exponential compounding is log-linear
+		f = f1*(f2/f1)**(float(n - n1)/(n2 - n1))
+		for interp in ('flat-forward', 'log-linear'):
+			curve = YieldCurve('2013-05-13', self.dates, self.rates, spec, interp)
+			self.assertAlmostEqual(curve.compound([d])[0], f, 12)
+		curve = YieldCurve('2013-05-13', self.dates, self.rates, spec, 'linear')
+		r = self.rates[1] + (self.rates[2] - self.rates[1])*(n - n1)/float(n2 - n1)
+		self.assertAlmostEqual(curve.rate([d])[0], r, 12)
+		# flat forward on simple compounding
+		curve = YieldCurve('2013-05-13', self.dates, self.rates, 
+			'annual simple actual/360')
+		f1 = 1 + self.rates[1]*49/360.0
+		f2 = 1 + self.rates[2]*234/360.0
+		fwd = (f2/f1 - 1)/(185/360.0)
+		self.assertAlmostEqual(curve.compound(['2013-09-02'])[0], 
+			f1*(1 + fwd*63/360.0), 14)
+	
+	def test_extrapolation(self):
+		'YieldCurve extrapolation'
+		spec = 'annual compounded actual/365'
+		for interp in YieldCurve.interpolations:
+			curve = YieldCurve('2013-05-13', self.dates, self.rates, spec, interp)
+			r = curve.rate(['2013-05-13', '2013-05-20', '2016-01-02'])
+			self.assertAlmostEqual(r[0], self.rates[0], 12)
+			self.assertAlmostEqual(r[1], self.rates[0], 12)
+			if interp == 'linear':
+				self.assertAlmostEqual(r[2], self.rates[-1], 12)
+			else:
+				self.assertTrue(r[2] > self.rates[-1])
+	
+	def test_invalid(self):
+		'YieldCurve invalid knots'
+		spec = 'annual compounded actual/365'
+		with self.assertRaises(Exception):
+			YieldCurve('2013-05-13', self.dates[::-1], self.rates, spec)
+		with self.assertRaises(Exception):
+			YieldCurve('2013-06-03', self.dates, self.rates, spec)
+		with self.assertRaises(Exception):
+			YieldCurve('2013-05-13', self.dates, self.rates, spec, 'cubic')
+
+class TestConvert(unittest.TestCase):
+	def test_convert_period_free(self):
+		'InterestRate convert without period'
+		ir_ = ir('0.1 annual compounded actual/365')
+		self.assertAlmostEqual(ir_.convert(compounding='continuous').rate, 
+			math.log(1.1), 14)
+		r = ir_.convert(frequency='semi-annual')
+		self.assertAlmostEqual(r.rate, math.sqrt(1.1) - 1, 14)
+		self.assertEqual(r.frequency, Frequency('semi-annual'))
+		self.assertEqual(r.compounding, ir_.compounding)
+		self.assertEqual(r.daycount, ir_.daycount)
+		self.assertAlmostEqual(ir('0.1 annual simple actual/360').convert(
+			frequency='monthly').rate, 0.1/12, 14)
+		with self.assertRaises(Exception):
+			ir_.convert(compounding='simple')
+		with self.assertRaises(Exception):
+			ir_.convert(daycount='actual/360')
+	
+	def test_convert_period(self):
+		'InterestRate convert over a period'
+		ir_ = ir('0.1 annual compounded business/252 calANBIMA')
+		p = period('2013-05-13:2013-11-13')
+		r = ir_.convert(compounding='simple', daycount='actual/360', period=p)
+		self.assertEqual(r.calendar, None)
+		self.assertAlmostEqual(r.compound(p), ir_.compound(p), 14)
+		r = ir('0.09 annual simple actual/360').convert(compounding='compounded',
+			daycount='business/252', calendar='ANBIMA', period=p)
+		self.assertTrue(r.calendar is calendars.get('ANBIMA'))
+		self.assertAlmostEqual(r.compound(p), 1 + 0.09*184/360.0, 14)
+		with self.assertRaises(Exception):
+			ir_.convert(daycount='actual/360', calendar='ANBIMA', period=p)
+	
+	def test_convert_many(self):
+		'Batch rate conversion'
+		starts = ['2013-05-13', '2013-05-13', '2014-01-02']
+		ends = ['2013-11-13', '2015-05-13', '2014-01-03']
+		rates = [0.1, 0.11, 0.095]
+		source = 'annual compounded business/252 calANBIMA'
+		target = ir('0 annual simple actual/360')
+		conv = convert(rates, (starts, ends), source, target)
+		for r, c, d in zip(rates, conv, zip(starts, ends)):
+			p = period('%s:%s' % d)
+			expected = ir('%s %s' % (r, source)).convert(compounding='simple', 
+				daycount='actual/360', period=p).rate
+			self.assertEqual(c, expected)
+		ir_ = InterestRate(np.array(rates), Frequency('annual'), 
+			Compounding('continuous'), DayCount('actual/365'))
+		conv = ir_.convert(compounding='compounded').rate
+		for c, r in zip(conv, rates):
+			self.assertAlmostEqual(c, math.exp(r) - 1, 14)
+
+class TestSolvers(unittest.TestCase):
+	def test_implied_rate(self):
+		'implied_rate inverts compound'
+		starts = ['2013-05-13', '2013-05-13', '2014-01-02']
+		ends = ['2013-11-13', '2015-05-13', '2014-01-03']
+		for comp in Compounding.names:
+			spec = 'annual %s business/252 calANBIMA' % comp
+			rates = np.array([0.1, 0.11, 0.095])
+			# floats, the repr of NumPy 2 scalars being np.float64(0.1)
+			specs = ['%r %s' % (r, spec) for r in rates.tolist()]
+			f = RateBook.from_specs(specs).compound((starts, ends))
+			implied = implied_rate(f, (starts, ends), spec)
+			for r, i in zip(rates, implied):
+				self.assertAlmostEqual(r, i, 12)
+		p = period('6 months')
+		self.assertAlmostEqual(implied_rate(1.05, p, 'annual simple actual/360'),
+			0.1, 14)
+		self.assertAlmostEqual(implied_rate(1.05, p, 'annual compounded actual/360'),
+			1.05**2 - 1, 14)
+		self.assertAlmostEqual(implied_rate(1.05, p, 'annual continuous actual/360'),
+			2*math.log(1.05), 14)
+	
+	def test_yield_to_maturity(self):
+		'yield_to_maturity solves many bonds in lockstep'
+		rng = np.random.RandomState(42)
+		n = 500
+		nflows = rng.randint(1, 21, n)
+		offsets = np.concatenate(([0], np.cumsum(nflows)[:-1]))
+		times = np.concatenate([np.arange(1, k + 1)*0.5 for k in nflows])
+		amounts = np.concatenate([[5.0]*(k - 1) + [105.0] for k in nflows])
+		for comp in Compounding.names:
+			yields = rng.uniform(0.01, 0.2, n)
+			owner = np.repeat(np.arange(n), nflows)
+			f = Compounding(comp).many(yields[owner], times)
+			prices = np.add.reduceat(amounts/f, offsets)
+			r, ok = yield_to_maturity(prices, amounts, times, offsets, comp)
+			self.assertTrue(ok.all())
+			self.assertTrue(np.allclose(r, yields, rtol=0, atol=1e-10))
+	
+	def test_yield_to_maturity_no_root(self):
+		'yield_to_maturity flags instruments which do not converge'
+		r, ok = yield_to_maturity([100.0, -1.0], [110.0, 110.0], [1.0, 1.0], [0, 1])
+		self.assertAlmostEqual(r[0], 0.1, 12)
+		self.assertEqual(ok.tolist(), [True, False])
+
+class TestBondBook(unittest.TestCase):
+	def test_cashflows(self):
+		'BondBook cashflows'
+		book = BondBook('2013-05-13', ['2014-01-31', '2015-08-31', '2013-06-15'],
+			[0.06, 0.08, 0.0], ['semi-annual', 'quarterly', 'annual'], 100.0)
+		dates, amounts, offsets = book.cashflows()
+		self.assertEqual(offsets.tolist(), [0, 2, 12])
+		self.assertEqual(dates.astype(str).tolist(), ['2013-07-31', '2014-01-31',
+			'2013-05-31', '2013-08-31', '2013-11-30', '2014-02-28', '2014-05-31',
+			'2014-08-31', '2014-11-30', '2015-02-28', '2015-05-31', '2015-08-31',
+			'2013-06-15'])
+		self.assertEqual(amounts.tolist(), [3.0, 103.0] + [2.0]*9 + [102.0, 100.0])
+		with self.assertRaises(Exception):
+			BondBook('2013-05-13', ['2013-05-13'])
+		with self.assertRaises(Exception):
+			BondBook('2013-05-13', ['2014-05-13'], 0.1, 'daily')
+	
+	def test_ntnf(self):
+		'BondBook NTN-F and LTN prices'
+		spec = 'annual compounded business/252 calANBIMA'
+		y = 0.09
+		book = BondBook.ntnf('2013-05-13', ['2017-01-01'])
+		dates, amounts, offsets = book.cashflows()
+		self.assertEqual(len(dates), 8)
+		c = 1000*(1.1**0.5 - 1)
+		self.assertAlmostEqual(amounts[0], c, 10)
+		cal = calendars.get('ANBIMA')
+		expected = sum(a/(1 + y)**(cal.bizdays(('2013-05-13', d))/252.0)
+			for a, d in zip(amounts, dates.astype(str)))
+		self.assertAlmostEqual(book.price('%r %s' % (y, spec))[0], expected, 9)
+		self.assertAlmostEqual(book.price_from_yields([y], spec)[0], expected, 9)
+		ltn = BondBook.ltn('2013-05-13', ['2014-01-01'])
+		du = cal.bizdays(('2013-05-13', '2014-01-01'))
+		self.assertAlmostEqual(ltn.price(ir('%r %s' % (y, spec)))[0], 
+			1000/(1 + y)**(du/252.0), 9)
+	
+	def test_price_curve_and_ytm(self):
+		'BondBook prices from curves and yields to maturity'
+		spec = 'annual compounded business/252 calANBIMA'
+		mats = ['2014-01-01', '2015-01-01', '2017-01-01', '2021-01-01']
+		book = BondBook.ntnf('2013-05-13', mats)
+		flat = YieldCurve('2013-05-13', mats, [0.1]*4, spec)
+		self.assertTrue(np.allclose(book.price(flat), 
+			book.price('0.1 ' + spec), rtol=1e-13))
+		yields = np.array([0.08, 0.09, 0.1, 0.11])
+		prices = book.price_from_yields(yields, spec)
+		r, ok = book.ytm(prices, spec)
+		self.assertTrue(ok.all())
+		self.assertTrue(np.allclose(r, yields, rtol=0, atol=1e-10))
+		with self.assertRaises(Exception):
+			book.price(YieldCurve('2013-05-14', mats, [0.1]*4, spec))
+
+
+class TestSchedule(unittest.TestCase):
+	"""Business day adjustment and coupon schedules."""
+	def test_adjust(self):
+		'following and preceding roll to the nearest business days'
+		index = calendars.get('ANBIMA')
+		hol = set(index.holidays)
+		isbiz = lambda d: d.weekday() < 5 and d not in hol
+		days = [date(2000, 1, 1) + timedelta(i) for i in range(0, 40000, 7)]
+		for d, f, p in zip(days, index.following(days), index.preceding(days)):
+			f, p = f.astype(object), p.astype(object)
+			self.assertTrue(isbiz(f) and f >= d)
+			self.assertTrue(isbiz(p) and p <= d)
+			self.assertFalse(any(isbiz(d + timedelta(i)) for i in range((f - d).days)))
+			self.assertFalse(any(isbiz(d - timedelta(i)) for i in range((d - p).days)))
+		# 2015-05-30 is a saturday, the following business day is in june
+		self.assertEqual(index.adjust(['2015-05-30'], 'modified-following')[0],
+			np.datetime64('2015-05-29'))
+		self.assertEqual(index.adjust(['2015-05-30'], 'following')[0],
+			np.datetime64('2015-06-01'))
+		self.assertRaises(Exception, index.adjust, ['2015-05-30'], 'nearest')
+	
+	def test_schedule(self):
+		'schedule rolls dates and handles stubs'
+		s = schedule('2015-01-15', '2017-01-01', 'semi-annual', 'ANBIMA')
+		self.assertEqual([str(d) for d in s], ['2015-01-15', '2015-07-01',
+			'2016-01-04', '2016-07-01', '2017-01-02'])
+		s = schedule('2015-01-15', '2017-01-01', 'semi-annual', 'ANBIMA', 
+			stub='long-front')
+		self.assertEqual([str(d) for d in s], ['2015-01-15', '2016-01-04', 
+			'2016-07-01', '2017-01-02'])
+		s = schedule('2015-01-15', '2017-01-01', 'semi-annual', 
+			rule='unadjusted', stub='short-back')
+		self.assertEqual([str(d) for d in s], ['2015-01-15', '2015-07-15',
+			'2016-01-15', '2016-07-15', '2017-01-01'])
+		s = schedule('2015-01-31', '2015-04-30', 'monthly', rule='unadjusted',
+			stub='short-back')
+		self.assertEqual([str(d) for d in s], ['2015-01-31', '2015-02-28', 
+			'2015-03-31', '2015-04-30'])
+		self.assertRaises(Exception, schedule, '2016-01-01', '2015-01-01', 'annual')
+		self.assertRaises(Exception, schedule, '2015-01-01', '2016-01-01', 'daily')
+	
+	def test_cache(self):
+		'schedule returns cached read-only arrays'
+		schedule_cache.clear()
+		s = schedule('2015-01-01', '2020-01-01', 'annual', 'ANBIMA')
+		self.assertTrue(schedule('2015-01-01', '2020-01-01', 'annual', 'ANBIMA') is s)
+		self.assertFalse(s.flags.writeable)
+		self.assertEqual(schedule_cache.stats()['hits'], 1)
+		self.assertFalse(schedule('2015-01-01', '2020-01-01', 'annual', 'ANBIMA', 
+			rule='preceding') is s)
+
+class TestBizdayArithmetic(unittest.TestCase):
+	"""Vectorized business day membership and offsets."""
+	def setUp(self):
+		self.index = calendars.get('ANBIMA')
+		self.days = np.arange('1995-01-01', '2085-01-01', 5, dtype='datetime64[D]')
+	
+	def test_isbizday(self):
+		'isbizday tells weekdays which are not holidays'
+		hol = set(self.index.holidays)
+		expected = [d.weekday() < 5 and d not in hol for d in self.days.astype(object)]
+		self.assertEqual(self.index.isbizday(self.days).tolist(), expected)
+		self.assertFalse(self.index.isbizday(date(2015, 12, 25)))
+		self.assertTrue(self.index.isbizday(date(2015, 12, 24)))
+	
+	def test_offset(self):
+		'offset shifts dates by n business days'
+		for n in (-3, -1, 0, 1, 2, 30):
+			shifted = self.index.offset(self.days, n)
+			self.assertTrue(self.index.isbizday(shifted).all())
+			if n >= 0:
+				count = self.index.bizdays_many(self.days, shifted)
+			else:
+				count = -self.index.bizdays_many(shifted, self.days)
+			self.assertTrue((count == n).all())
+		# 2015-12-24 (thursday) D+1 skips christmas and the weekend
+		self.assertEqual(self.index.offset(date(2015, 12, 24), 1), 
+			np.datetime64('2015-12-28'))
+		self.assertEqual(self.index.offset(date(2015, 12, 26), 0), 
+			np.datetime64('2015-12-28'))
+		# backwards, saturday is rolled back to thursday first
+		self.assertEqual(self.index.offset(date(2015, 12, 26), -1), 
+			np.datetime64('2015-12-23'))
+		n = np.arange(len(self.days)) % 5
+		self.assertTrue(np.array_equal(self.index.offset(self.days, n),
+			[self.index.offset(d, k) for d, k in zip(self.days, n)]))
+
+class TestAccrualIndex(unittest.TestCase):
+	"""Daily accrual index with incremental fixings."""
+	def setUp(self):
+		index = calendars.get('ANBIMA')
+		self.days = np.unique(index.following(np.arange('2010-01-01', '2013-01-01', 
+			dtype='datetime64[D]')))
+		self.rates = 0.08 + 0.02*np.cos(np.arange(len(self.days))/50.0)
+	
+	def expected(self, start, end):
+		start, end = np.datetime64(start), np.datetime64(end)
+		valid = (self.days >= start) & (self.days < end)
+		return np.prod((1 + self.rates[valid])**(1/252.0))
+	
+	def test_factor(self):
+		'AccrualIndex factors match the product of the daily factors'
+		cdi = AccrualIndex(self.days, self.rates)
+		self.assertEqual(len(cdi), len(self.days))
+		for start, end in [('2010-01-01', '2013-01-01'), ('2011-02-05', '2011-02-07'),
+				('2011-05-03', '2012-11-30'), ('2009-01-01', '2010-06-01')]:
+			self.assertAlmostEqual(cdi.factor(start, end), self.expected(start, end), 12)
+		self.assertEqual(cdi.factor('2012-01-01', '2011-01-01'), 1.0)
+		self.assertEqual(cdi.factor('2000-01-01', '2005-01-01'), 1.0)
+		starts = self.days[::7]
+		ends = starts + 90
+		f = cdi.factor(starts, ends)
+		for i in range(0, len(starts), 25):
+			self.assertAlmostEqual(f[i], self.expected(starts[i], ends[i]), 12)
+	
+	def test_append(self):
+		'AccrualIndex appended one fixing at a time matches the whole series'
+		cdi = AccrualIndex(convention=ir('0 annual compounded business/252'))
+		for d, r in zip(self.days, self.rates):
+			cdi.append(d, r)
+		full = AccrualIndex(self.days, self.rates)
+		self.assertTrue(np.array_equal(cdi.dates, full.dates))
+		self.assertAlmostEqual(cdi.factor('2010-01-01', '2013-01-01'), 
+			full.factor('2010-01-01', '2013-01-01'), 12)
+		self.assertRaises(Exception, cdi.append, self.days[-1], 0.1)
+		self.assertRaises(Exception, cdi.extend, ['2014-01-02', '2014-01-01'], [0.1, 0.1])
+		cdi.append('2014-01-02', 0.1)
+		self.assertAlmostEqual(cdi.factor('2014-01-01', '2014-01-03'), 1.1**(1/252.0), 14)
+	
+	def test_calendar_days(self):
+		'AccrualIndex fixings accrue the calendar days up to the next one'
+		# friday, monday, tuesday
+		days = ['2015-01-02', '2015-01-05', '2015-01-06']
+		idx = AccrualIndex(days, [0.1, 0.2, 0.3], 'annual simple actual/360')
+		self.assertAlmostEqual(idx.factor('2015-01-02', '2015-01-05'), 1 + 0.1*3/360, 14)
+		self.assertAlmostEqual(idx.factor('2015-01-03', '2015-01-04'),
+			(1 + 0.1*2/360)/(1 + 0.1/360), 14)
+		self.assertAlmostEqual(idx.factor('2015-01-02', '2015-01-07'),
+			(1 + 0.1*3/360)*(1 + 0.2/360)*(1 + 0.3/360), 14)
+		self.assertAlmostEqual(idx.factor('2015-01-06', '2015-01-31'), 1 + 0.3/360, 14)
+		idx.append('2015-01-09', 0.4)
+		self.assertAlmostEqual(idx.factor('2015-01-06', '2015-01-31'),
+			(1 + 0.3*3/360)*(1 + 0.4/360), 14)
+		rate = ir('0 annual compounded actual/365')
+		idx = AccrualIndex(self.days, self.rates, rate)
+		gaps = np.diff(self.days).astype(np.int64)
+		expected = np.prod((1 + self.rates[:-1])**(gaps/365.0))
+		self.assertAlmostEqual(idx.factor(self.days[0], self.days[-1]), expected, 10)
+
+class TestThirty360(unittest.TestCase):
+	"""30/360 family and actual/365L day counts."""
+	cases = [
+		# day count, start, end, days
+		('30/360', '2007-01-15', '2007-01-31', 16),
+		('30/360', '2007-01-31', '2007-02-28', 28),
+		('30/360', '2007-01-30', '2007-03-31', 60),
+		('30/360', '2007-02-28', '2007-03-31', 33),
+		('30/360 US', '2007-02-28', '2007-03-31', 30),
+		('30/360 US', '2007-02-28', '2008-02-29', 360),
+		('30/360 US', '2007-01-31', '2007-02-28', 28),
+		('30E/360 ISDA', '2007-02-28', '2008-02-29', 360),
+		('30E/360 ISDA', '2007-01-15', '2007-02-28', 45),
+		('30E+/360', '2007-01-30', '2007-03-31', 61),
+		('30E+/360', '2007-01-31', '2007-02-28', 28),
+	]
+	
+	def test_days(self):
+		for name, start, end, days in self.cases:
+			self.assertEqual(DayCount(name).days(start, end), days, 
+				'%s %s %s' % (name, start, end))
+	
+	def test_vectorized(self):
+		for name in ('30/360', '30/360 US', '30E/360 ISDA', '30E+/360'):
+			cases = [c for c in self.cases if c[0] == name]
+			starts = [c[1] for c in cases]
+			ends = [c[2] for c in cases]
+			days = DayCount(name).days(starts, ends)
+			self.assertEqual(days.tolist(), [c[3] for c in cases])
+			tf = DayCount(name).timefactor(period_array((starts, ends)))
+			self.assertTrue(np.allclose(tf, days/360.0))
+	
+	def test_rates(self):
+		r = ir('0.05 semi-annual simple 30/360')
+		self.assertAlmostEqual(r.compound(period('2007-01-31:2007-07-31')), 1.05)
+		self.assertEqual(r.compound_many((['2007-01-31'], ['2007-07-31']))[0],
+			r.compound(period('2007-01-31:2007-07-31')))
+		dc = DayCount('actual/365L')
+		self.assertEqual(dc.timefactor(period('2007-12-31:2008-12-31')), 1.0)
+		self.assertEqual(dc.timefactor(period('2006-12-31:2007-12-31')), 1.0)
+		self.assertEqual(dc.timefactor(period('365 days')), 1.0)
+	
+	def test_ir(self):
+		'ir and compound_specs parse every 30/360 day count'
+		p = '2007-02-28:2008-02-29'
+		for name in ('30/360', '30/360 US', '30E/360 ISDA', '30E+/360'):
+			spec = '0.05 annual simple %s' % name
+			r = ir(spec)
+			self.assertEqual(r.daycount, DayCount(name))
+			expected = 1 + 0.05*DayCount(name).days('2007-02-28', '2008-02-29')/360.0
+			self.assertAlmostEqual(r.compound(period(p)), expected, 14)
+			self.assertAlmostEqual(compound_specs([spec], [p])[0], expected, 14)
+		self.assertEqual(ir('0.05 annual  30E/360   ISDA simple').daycount,
+			DayCount('30E/360 ISDA'))
+	
+	def test_actual365L(self):
+		dc = DayCount('actual/365L')
+		p = period('2008-01-01:2008-02-15')
+		self.assertEqual(dc.timefactor(p), 45/365.0)
+		self.assertEqual(dc.timefreq(p, Frequency('annual')), 45/365.0)
+		self.assertEqual(dc.timefreq(p, Frequency('semi-annual')), 2*45/366.0)
+		self.assertEqual(dc.timefactor(period('2008-02-01:2008-03-01')), 29/366.0)
+		self.assertEqual(dc.timefactor(period('2008-02-29:2009-02-28')), 365/365.0)
+		starts = ['2008-01-01', '2008-02-01', '1800-02-01', '2400-02-01']
+		ends = ['2008-02-15', '2008-03-01', '1800-03-01', '2400-03-01']
+		self.assertTrue(np.allclose(dc.timefactor(period_array((starts, ends))),
+			[45/365.0, 29/366.0, 28/365.0, 29/366.0], rtol=1e-15))
+	
+	def test_span(self):
+		# dates out of the span of the tables count as the ones inside it
+		starts = np.array(['1899-12-31', '1900-01-01', '2200-12-31', '2000-02-29'],
+			dtype='datetime64[D]')
+		ends = starts + np.array([31, 59, 31, 366])
+		for name in ('30/360', '30/360 US', '30E/360 ISDA', '30E+/360'):
+			dc = DayCount(name)
+			self.assertEqual(dc.days(starts, ends).tolist(), [dc.days(s, e) 
+				for s, e in zip(starts.tolist(), ends.tolist())])
+			self.assertEqual(dc.days(starts[1:2], ends[1:2]).tolist(),
+				dc.days(starts, ends)[1:2].tolist())
+
+class TestTimefreqCache(unittest.TestCase):
+	"""Memoized times of date range periods."""
+	def tearDown(self):
+		timefreq_cache.resize(0)
+		timefreq_cache.clear()
+	
+	def test_global(self):
+		r = ir('0.1 annual compounded business/252 calANBIMA')
+		p = period('2015-01-02:2016-01-04')
+		expected = r.compound(p)
+		self.assertEqual(len(timefreq_cache), 0)
+		timefreq_cache.resize(16)
+		self.assertEqual(r.compound(p), expected)
+		self.assertEqual(r.compound(period('2015-01-02:2016-01-04')), expected)
+		self.assertEqual(timefreq_cache.stats()['hits'], 1)
+		self.assertEqual(timefreq_cache.hitrate, 0.5)
+		q = ir('0.1 annual simple actual/360')
+		self.assertEqual(q.compound(p), 1 + 0.1*367/360.0)
+		self.assertEqual(len(timefreq_cache), 2)
+	
+	def test_per_rate(self):
+		cache = LRUCache(16)
+		rate = ir('0.1 annual compounded business/252 calANBIMA')
+		r = InterestRate(0.1, rate.frequency, rate.compounding, rate.daycount,
+			rate.calendar, cache)
+		p = period('2015-01-02:2016-01-04')
+		self.assertEqual(r.compound(p), rate.compound(p))
+		self.assertEqual(r.compound(p), rate.compound(p))
+		self.assertEqual(cache.stats()['hits'], 1)
+		self.assertEqual(len(timefreq_cache), 0)
+		self.assertTrue(r.convert('semi-annual', period=p).cache is cache)
+	
+	def test_reload(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			fname = os.path.join(tmpdir, 'TEST.cal')
+			with open(fname, 'w') as f:
+				f.write('Saturday\nSunday\n2015-01-05\n')
+			registry = CalendarRegistry([tmpdir], interval=0)
+			timefreq_cache.resize(16)
+			p = period('2015-01-02:2015-01-09')
+			r = InterestRate(0.1, Frequency('annual'), Compounding('simple'),
+				DayCount('business/252'), registry.get('TEST'))
+			self.assertEqual(r.compound(p), 1 + 0.1*4/252.0)
+			with open(fname, 'w') as f:
+				f.write('Saturday\nSunday\n')
+			os.utime(fname, (0, os.path.getmtime(fname) + 10))
+			r = InterestRate(0.1, Frequency('annual'), Compounding('simple'),
+				DayCount('business/252'), registry.get('TEST'))
+			self.assertEqual(registry.stats()['reloads'], 1)
+			self.assertEqual(r.compound(p), 1 + 0.1*5/252.0)
+		finally:
+			shutil.rmtree(tmpdir)
+
+class TestParsePeriods(unittest.TestCase):
+	"""Batch parsing of period specifications."""
+	def test_columns(self):
+		specs = ['2012-07-12:2012-07-16', '3 months', '2012-7-1:2012-07-22',
+			'1.5 years', '3 months']
+		starts, ends, sizes, units = parse_periods(specs)
+		self.assertEqual(starts.dtype, np.dtype('datetime64[D]'))
+		self.assertEqual([str(d) for d in starts], ['2012-07-12', 'NaT', 
+			'2012-07-01', 'NaT', 'NaT'])
+		self.assertEqual([str(d) for d in ends], ['2012-07-16', 'NaT', 
+			'2012-07-22', 'NaT', 'NaT'])
+		self.assertEqual(sizes.tolist(), [4, 3, 21, 1.5, 3])
+		self.assertEqual([str(u) for u in units], ['day', 'month', 'day', 
+			'year', 'month'])
+	
+	def test_bytes(self):
+		specs = ['2012-07-12:2012-07-16', '3 months', '2012-7-1:2012-07-22']
+		expected = parse_periods(specs)
+		result = parse_periods(np.array([s.encode() for s in specs]))
+		for column, other in zip(result, expected):
+			self.assertEqual([str(v) for v in column], [str(v) for v in other])
+	
+	def test_dates(self):
+		days = np.arange('1800-01-01', '2200-01-01', 13, dtype='datetime64[D]')
+		specs = ['%s:%s' % (d, d + 400) for d in days]
+		starts, ends, sizes, units = parse_periods(specs)
+		self.assertTrue(np.array_equal(starts, days))
+		self.assertTrue(np.array_equal(ends, days + 400))
+		self.assertTrue((sizes == 400).all())
+		for spec in ['2015-02-29:2015-03-01', '2016-13-10:2017-01-01',
+				'2016-01-00:2016-02-01', '2016/01/10:2016-02-01', 'one day',
+				'2016-02-01:2016-01-10', '2016-2-1:2016-01-10']:
+			self.assertRaises(Exception, parse_periods, [spec])
+		# reversed ranges, rejected like period does
+		self.assertRaises(Exception, period, '2016-02-01:2016-01-10')
+		self.assertRaises(Exception, parse_periods, ['3 months', '2016-2-1:2016-01-10'])
+	
+	def test_period_array(self):
+		r = ir('0.1 annual compounded business/252 calANBIMA')
+		specs = ['2015-01-02:2016-01-04', '2015-03-10:2015-12-31']
+		f = r.compound_many(specs)
+		self.assertEqual(f.tolist(), [r.compound(period(p)) for p in specs])
+		p = period_array(np.array(['1 month', '2.5 months']))
+		self.assertEqual(p.unit, 'month')
+		self.assertEqual(p.size().tolist(), [1, 2.5])
+		self.assertRaises(Exception, period_array, ['1 month', '2 days'])
+		self.assertRaises(Exception, period_array, ['1 month', specs[0]])
+
+class TestCompoundCSV(unittest.TestCase):
+	"""Streaming computation of the factors of CSV files."""
+	rows = [
+		('0.1 annual compounded business/252 calANBIMA', '2015-01-02:2016-01-04'),
+		('0.05 annual simple actual/360', '6 months'),
+		('0.1 annual compounded business/252 calANBIMA', '252 days'),
+		('0.05 annual simple actual/360', '2015-01-02:2015-03-02'),
+		('0.06 semi-annual compounded 30/360', '2015-01-31:2015-07-31'),
+	]
+	
+	def source(self):
+		return StringIO('rate,period\n' + ''.join('%s,%s\n' % r for r in self.rows))
+	
+	def check(self, output):
+		lines = output.strip().splitlines()
+		self.assertEqual(lines[0].strip(), 'rate,period,compound,discount')
+		self.assertEqual(len(lines), len(self.rows) + 1)
+		for line, (rate, per) in zip(lines[1:], self.rows):
+			fields = line.strip().split(',')
+			self.assertEqual(fields[:2], [rate, per])
+			expected = ir(rate).compound(period(per))
+			self.assertAlmostEqual(float(fields[2]), expected, 14)
+			self.assertAlmostEqual(float(fields[3]), 1/expected, 14)
+	
+	def test_chunks(self):
+		chunks = []
+		target = StringIO()
+		total = compound_csv(self.source(), target, chunksize=2, 
+			report=chunks.append)
+		self.check(target.getvalue())
+		self.assertEqual([c['rows'] for c in chunks], [2, 2, 1])
+		self.assertEqual(total['chunk'], 3)
+		self.assertEqual(total['rows'], 5)
+	
+	def test_main(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			source = os.path.join(tmpdir, 'book.csv')
+			target = os.path.join(tmpdir, 'factors.csv')
+			with open(source, 'w') as f:
+				f.write(self.source().getvalue())
+			main([source, target, '--chunksize', '3', '--quiet'])
+			with open(target) as f:
+				self.check(f.read())
+		finally:
+			shutil.rmtree(tmpdir)
+
+class TestPresentValue(unittest.TestCase):
+	"""Sharded and parallel valuation of cashflows."""
+	def setUp(self):
+		rng = np.random.RandomState(0)
+		n = 5000
+		specs = ['0.1 annual compounded business/252 calANBIMA',
+			'0.05 annual simple actual/360', '0.07 semi-annual compounded 30/360']
+		self.book = RateBook.from_specs(specs).take(rng.randint(0, 3, n))
+		self.starts = np.datetime64('2015-01-02') + rng.randint(0, 30, n)
+		self.ends = self.starts + rng.randint(1, 5000, n)
+		self.amounts = rng.uniform(1, 1000, n)
+		self.curve = YieldCurve('2015-01-02', ['2016-01-04', '2020-01-02'], 
+			[0.12, 0.11], 'annual compounded business/252 calANBIMA')
+	
+	def test_serial(self):
+		values, total = present_value(self.amounts, self.starts, self.ends, 
+			self.book, shardsize=1000)
+		expected = self.amounts*self.book.discount((self.starts, self.ends))
+		self.assertTrue(np.array_equal(values, expected))
+		self.assertAlmostEqual(total, expected.sum(), 6)
+		values, total = present_value(self.amounts, self.starts, self.ends, 
+			self.curve, shardsize=1000)
+		self.assertTrue(np.array_equal(values, 
+			self.amounts*self.curve.discount(self.ends)))
+		self.assertRaises(Exception, present_value, self.amounts, self.starts,
+			self.ends, ir('0.1 annual simple actual/360'))
+	
+	def test_parallel(self):
+		try:
+			import concurrent.futures
+		except ImportError:
+			self.skipTest('concurrent.futures is not available')
+		for discount in (self.book, self.curve):
+			serial = present_value(self.amounts, self.starts, self.ends, 
+				discount, shardsize=700)
+			for workers in (2, 3):
+				values, total = present_value(self.amounts, self.starts, 
+					self.ends, discount, workers, shardsize=700)
+				self.assertTrue(np.array_equal(values, serial[0]))
+				self.assertEqual(total, serial[1])
+
+class TestPricingServer(unittest.TestCase):
+	"""Micro-batching pricing service (Python 3 only)."""
+	def test_load(self):
+		import sys
+		if sys.version_info < (3, 7):
+			self.skipTest('the pricing service requires Python 3.7+')
+		from fixedincome_server import run_local
+		answers, stats, metrics = run_local(300, 16, batch_size=32, max_wait=0.01)
+		self.assertEqual(len(answers), 300)
+		for request, answer in answers:
+			self.assertEqual(answer['id'], request['id'])
+			self.assertEqual(answer['compound'], 
+				ir(request['rate']).compound(period(request['period'])))
+		self.assertEqual(metrics['requests'], 300)
+		self.assertEqual(metrics['errors'], 0)
+		self.assertTrue(metrics['batches'] < 300)
+		self.assertTrue(metrics['p99_ms'] >= metrics['p50_ms'] > 0)
+	
+	def test_compute(self):
+		import sys
+		if sys.version_info < (3, 7):
+			self.skipTest('the pricing service requires Python 3.7+')
+		import fixedincome_server
+		rates = ['0.1 annual simple actual/360', 'not a rate',
+			'0.1 annual compounded business/252 calANBIMA', '0.1 annual simple actual/360']
+		periods = ['3 months', '2015-01-02:2016-01-04', '2015-01-02:2016-01-04',
+			'2015-01-05:2015-01-02']
+		calls = []
+		def counted(rate_specs, period_specs):
+			calls.append(len(rate_specs))
+			return compound_specs(rate_specs, period_specs)
+		fixedincome_server.compound_specs = counted
+		try:
+			results = fixedincome_server._compute(rates, periods)
+		finally:
+			fixedincome_server.compound_specs = compound_specs
+		self.assertEqual(calls, [2])
+		self.assertEqual(results[0], ir(rates[0]).compound(period(periods[0])))
+		self.assertEqual(results[2], ir(rates[2]).compound(period(periods[2])))
+		self.assertTrue(results[1].startswith('Invalid request'))
+		self.assertTrue(results[3].startswith('Invalid request'))
+
+class TestInstrumentation(unittest.TestCase):
+	"""Opt-in counters and timers of the hot paths."""
+	def tearDown(self):
+		while instrumentation.enabled:
+			instrumentation.disable()
+		instrumentation.reset()
+	
+	def test_swap(self):
+		import fixedincome
+		original = fixedincome.ir
+		size = CalendarRangePeriod.__dict__['size']
+		instrumentation.enable()
+		instrumentation.enable()
+		self.assertTrue(fixedincome.ir is not original)
+		self.assertTrue(fixedincome.ir.__wrapped__ is original)
+		instrumentation.disable()
+		self.assertTrue(instrumentation.enabled)
+		instrumentation.disable()
+		self.assertFalse(instrumentation.enabled)
+		self.assertTrue(fixedincome.ir is original)
+		self.assertTrue(CalendarRangePeriod.__dict__['size'] is size)
+	
+	def test_profile(self):
+		import fixedincome
+		spec = '0.1 annual compounded business/252 calANBIMA'
+		fixedincome.ir(spec)
+		with profile() as prof:
+			r = fixedincome.ir(spec)
+			p = fixedincome.period('2015-01-02:2016-01-04')
+			self.assertAlmostEqual(r.compound(p), 1.1**(252/252.0), 2)
+		stats = prof.snapshot()
+		self.assertFalse(instrumentation.enabled)
+		self.assertEqual(stats['functions']['ir']['calls'], 1)
+		self.assertEqual(stats['functions']['period']['calls'], 1)
+		self.assertEqual(stats['functions']['CalendarRangePeriod.size']['calls'], 1)
+		self.assertEqual(stats['functions']['DayCount.timefreq']['calls'], 1)
+		self.assertEqual(stats['functions']['Compounding.__call__']['calls'], 1)
+		self.assertTrue(stats['functions']['ir']['seconds'] > 0)
+		self.assertEqual(stats['caches']['ir_cache']['hits'], 1)
+		r.compound(p)
+		self.assertEqual(prof.snapshot(), stats)
+		self.assertEqual(instrumentation.snapshot()['functions']['ir']['calls'], 1)
+	
+	def test_prometheus(self):
+		with profile() as prof:
+			compound_specs(['0.1 annual simple actual/360'], ['2015-01-02:2015-01-03'])
+		text = prof.prometheus()
+		self.assertTrue('# TYPE fixedincome_calls_total counter' in text)
+		self.assertTrue('fixedincome_calls_total{function="ir"} 1\n' in text)
+		self.assertTrue('# TYPE fixedincome_cache_entries gauge' in text)
+		self.assertTrue('fixedincome_cache_hits_total{cache="calendars"}' in text)
+
+class TestLazyImport(unittest.TestCase):
+	"""Dependencies, calendars and tables loaded on first need."""
+	def test_import(self):
+		import sys
+		import subprocess
+		if sys.version_info < (3, 7):
+			self.skipTest('lazy module attributes require Python 3.7+')
+		code = 'import sys, fixedincome; print(sorted(set(sys.modules) & set(%r)))'
+		modules = ['bizdays', 'csv', 'mmap', 'tempfile']
+		out = subprocess.check_output([sys.executable, '-c', code % modules],
+			cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True)
+		self.assertEqual(out.strip(), '[]')
+		import fixedincome
+		from bizdays import Calendar
+		self.assertTrue(fixedincome.Calendar is Calendar)
+	
+	def test_star_import(self):
+		namespace = {}
+		exec('from fixedincome import *', namespace)
+		from bizdays import Calendar
+		self.assertTrue(namespace['Calendar'] is Calendar)
+		for name in ('ir', 'period', 'DayCount', 'calendars', 'np', 'date'):
+			self.assertTrue(name in namespace)
+		self.assertFalse('_ymd' in namespace)
+	
+	def test_prewarm(self):
+		calendars.clear()
+		prewarm('ANBIMA')
+		self.assertEqual(calendars.names(), ('ANBIMA',))
+		self.assertEqual(calendars.stats()['misses'], 1)
+		ir('0.1 annual compounded business/252 calANBIMA')
+		self.assertEqual(calendars.stats()['misses'], 1)
+
+class TestColumns(unittest.TestCase):
+	"""Compounding and discount factors of table columns."""
+	def setUp(self):
+		self.specs = ['annual compounded business/252 calANBIMA',
+			'annual simple actual/360', 'annual simple actual/360']
+		self.rates = np.array([0.1, 0.05, 0.06])
+		self.starts = np.array(['2015-01-02', '2015-01-02', '2015-02-01'],
+			dtype='datetime64[D]')
+		self.ends = np.array(['2016-01-04', '2015-07-02', '2015-03-01'],
+			dtype='datetime64[D]')
+		self.expected = np.array([ir('%r %s' % (r, c)).compound(
+			DateRangePeriod((s, e))) for r, c, s, e in zip(self.rates.tolist(),
+			self.specs, self.starts.tolist(), self.ends.tolist())])
+	
+	def test_numpy(self):
+		f = compound_columns(self.rates, self.starts, self.ends, self.specs)
+		self.assertTrue(np.allclose(f, self.expected, rtol=1e-15))
+		d = discount_columns(self.rates, self.starts, self.ends, self.specs)
+		self.assertTrue(np.allclose(d, 1/self.expected, rtol=1e-15))
+		with self.assertRaises(Exception):
+			compound_columns(self.rates, self.starts[:2], self.ends, self.specs)
+	
+	def test_pandas(self):
+		try:
+			import pandas
+		except ImportError:
+			self.skipTest('pandas is not installed')
+		df = pandas.DataFrame({'rate': self.rates, 'start': self.starts,
+			'end': self.ends, 'convention': pandas.Categorical(self.specs)},
+			index=[10, 20, 30])
+		f = compound_columns(df.rate, df.start, df.end, df.convention)
+		self.assertTrue(isinstance(f, pandas.Series))
+		self.assertEqual(list(f.index), [10, 20, 30])
+		self.assertEqual(f.name, 'compound')
+		self.assertTrue(np.allclose(f.values, self.expected, rtol=1e-15))
+		d = discount_columns(df.rate, df.start, df.end, df.convention.astype(object))
+		self.assertTrue(np.allclose(d.values, 1/self.expected, rtol=1e-15))
+	
+	def test_arrow(self):
+		try:
+			import pyarrow
+		except ImportError:
+			self.skipTest('pyarrow is not installed')
+		table = pyarrow.table({'rate': self.rates,
+			'start': pyarrow.array(self.starts, pyarrow.date32()),
+			'end': pyarrow.array(self.ends, pyarrow.date32()),
+			'convention': pyarrow.array(self.specs).dictionary_encode()})
+		f = compound_columns(table['rate'], table['start'], table['end'],
+			table['convention'])
+		self.assertTrue(isinstance(f, pyarrow.Array))
+		self.assertTrue(np.allclose(f.to_numpy(), self.expected, rtol=1e-15))
+		sliced = table.slice(1)
+		d = discount_columns(sliced['rate'], sliced['start'], sliced['end'],
+			sliced['convention'].cast(pyarrow.string()))
+		self.assertTrue(np.allclose(d.to_numpy(), 1/self.expected[1:], rtol=1e-15))
+
+class TestFactorCache(unittest.TestCase):
+	"""Memoized compounding factors with expiry and calendar invalidation."""
+	def tearDown(self):
+		factor_cache.resize(0)
+		factor_cache.set_ttl(60.0)
+		factor_cache.clear()
+	
+	def test_TTLCache(self):
+		now = [0.0]
+		cache = TTLCache(2, ttl=10, clock=lambda: now[0])
+		cache.set('a', 1)
+		now[0] = 5
+		cache.set('b', 2)
+		self.assertEqual(cache.get('a'), 1)
+		now[0] = 10
+		self.assertEqual(cache.get('a'), None)
+		self.assertEqual(cache.get('b'), 2)
+		now[0] = 15
+		cache.set('c', 3)
+		self.assertFalse('b' in cache)
+		self.assertEqual(cache.invalidate(lambda k, v: v == 3), 1)
+		self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 0,
+			'maxsize': 2, 'expirations': 2, 'invalidations': 1, 'ttl': 10})
+	
+	def test_compound(self):
+		r = ir('0.1 annual compounded business/252 calANBIMA')
+		p = period('2015-01-02:2016-01-04')
+		expected = r.compound(p)
+		self.assertEqual(len(factor_cache), 0)
+		factor_cache.resize(16)
+		self.assertEqual(r.compound(p), expected)
+		self.assertEqual(r.discount(period('2015-01-02:2016-01-04')), 1/expected)
+		self.assertEqual(compound(ir('0.1 annual compounded business/252 calANBIMA'),
+			p), expected)
+		self.assertEqual(factor_cache.stats()['hits'], 2)
+		ir('0.11 annual compounded business/252 calANBIMA').compound(p)
+		ir('0.1 annual simple actual/360').compound(p)
+		self.assertEqual(len(factor_cache), 3)
+		self.assertEqual(invalidate_calendar('ANBIMA'), 2)
+		self.assertEqual(len(factor_cache), 1)
+	
+	def test_reload(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			fname = os.path.join(tmpdir, 'TEST.cal')
+			with open(fname, 'w') as f:
+				f.write('Saturday\nSunday\n2015-01-05\n')
+			registry = CalendarRegistry([tmpdir], interval=0)
+			factor_cache.resize(16)
+			p = period('2015-01-02:2015-01-09')
+			r = InterestRate(0.1, Frequency('annual'), Compounding('simple'),
+				DayCount('business/252'), registry.get('TEST'))
+			self.assertEqual(r.compound(p), 1 + 0.1*4/252.0)
+			with open(fname, 'w') as f:
+				f.write('Saturday\nSunday\n')
+			os.utime(fname, (0, os.path.getmtime(fname) + 10))
+			r = InterestRate(0.1, Frequency('annual'), Compounding('simple'),
+				DayCount('business/252'), registry.get('TEST'))
+			self.assertEqual(r.compound(p), 1 + 0.1*5/252.0)
+			self.assertEqual(factor_cache.stats()['invalidations'], 1)
+		finally:
+			shutil.rmtree(tmpdir)
 
 if __name__ == '__main__':
 	unittest.main(verbosity=2)